@@ -0,0 +1,283 @@
+# benchmark.py
+
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import Qt, QT_VERSION_STR
+from PyQt5.Qsci import QSCINTILLA_VERSION_STR
+from PyQt5.QtTest import QTest
+
+from trace_generator import write_trace
+from snapshot_cache import snapshot_path
+from perf import recorder
+
+MIXES = {
+    "code": {"code": 0.95, "text": 0.04, "file": 0.01},
+    "mixed": {"code": 0.8, "text": 0.15, "file": 0.05},
+    "notes": {"code": 0.4, "text": 0.5, "file": 0.1},
+}
+
+LANGUAGE_SWITCH = {"Python": "C++", "C++": "Java", "Java": "Python"}
+
+PASTE_BLOCK = "\n".join(f"    pasted_{i} = compute({i}, 'x')" for i in range(200)) + "\n"
+
+APPEND_ROWS = [(0, f"    appended_{i} = step({i})") for i in range(5000)]
+
+SCENARIOS = {}
+
+def scenario(name):
+    def register(fn):
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+
+class BenchContext:
+    def __init__(self, app, window, trace_path, work_dir, repeat):
+        self.app = app
+        self.window = window
+        self.editor = window.editor
+        self.trace_path = trace_path
+        self.work_dir = work_dir
+        self.repeat = repeat
+
+    def settle(self):
+        # Twice: the editor defers its row/fold updates with QTimer.singleShot(0)
+        self.app.processEvents()
+        self.app.processEvents()
+
+    def measure(self, action, setup=None, teardown=None):
+        """
+        Run `action` `repeat` times and return the durations in ms, including
+        the deferred work it triggers. setup/teardown are not timed.
+        """
+        durations = []
+        for _ in range(self.repeat):
+            if setup:
+                setup()
+                self.settle()
+            start = time.perf_counter()
+            action()
+            self.settle()
+            durations.append((time.perf_counter() - start) * 1000)
+            if teardown:
+                teardown()
+                self.settle()
+        return durations
+
+    def keystroke_at(self, line):
+        line = min(line, self.editor.lines() - 1)
+
+        def setup():
+            self.editor.setCursorPosition(line, len(self.editor.text(line).rstrip("\r\n")))
+        return self.measure(lambda: QTest.keyClick(self.editor, Qt.Key_X),
+                            setup=setup, teardown=self.editor.undo)
+
+
+@scenario("open_cold")
+def bench_open_cold(ctx):
+    def setup():
+        if os.path.exists(snapshot_path(ctx.trace_path)):
+            os.remove(snapshot_path(ctx.trace_path))
+    return ctx.measure(lambda: ctx.window.load_trace_file(ctx.trace_path), setup=setup)
+
+@scenario("open_warm")
+def bench_open_warm(ctx):
+    # The document was just loaded from the trace, so its snapshot matches
+    ctx.window.save_snapshot(ctx.trace_path, ctx.editor.text())
+    durations = ctx.measure(lambda: ctx.window.load_trace_file(ctx.trace_path))
+    os.remove(snapshot_path(ctx.trace_path))
+    return durations
+
+@scenario("full_style")
+def bench_full_style(ctx):
+    return ctx.measure(lambda: ctx.editor.lexer().styleText(0, 0))
+
+@scenario("keystroke_top")
+def bench_keystroke_top(ctx):
+    return ctx.keystroke_at(0)
+
+@scenario("keystroke_middle")
+def bench_keystroke_middle(ctx):
+    return ctx.keystroke_at(ctx.editor.lines() // 2)
+
+@scenario("keystroke_end")
+def bench_keystroke_end(ctx):
+    return ctx.keystroke_at(ctx.editor.lines() - 1)
+
+@scenario("paste")
+def bench_paste(ctx):
+    def setup():
+        QApplication.clipboard().setText(PASTE_BLOCK)
+        ctx.editor.setCursorPosition(ctx.editor.lines() // 2, 0)
+    return ctx.measure(ctx.editor.paste, setup=setup, teardown=ctx.editor.undo)
+
+@scenario("follow_append")
+def bench_follow_append(ctx):
+    from core_lexer import LineType
+    rows = [(LineType(line_type), text) for line_type, text in APPEND_ROWS]
+    length = ctx.editor.length()
+
+    def teardown():
+        ctx.editor.SendScintilla(ctx.editor.SCI_DELETERANGE, length, ctx.editor.length() - length)
+    return ctx.measure(lambda: ctx.editor.append_rows(rows), teardown=teardown)
+
+@scenario("fold_all")
+def bench_fold_all(ctx):
+    return ctx.measure(ctx.editor.collapse_all_code, teardown=ctx.editor.expand_all)
+
+@scenario("theme_switch")
+def bench_theme_switch(ctx):
+    def switch():
+        if ctx.window.current_theme == "Dark":
+            ctx.window.use_light_theme()
+        else:
+            ctx.window.use_dark_theme()
+    return ctx.measure(switch)
+
+@scenario("language_switch")
+def bench_language_switch(ctx):
+    return ctx.measure(lambda: ctx.window.use_language(LANGUAGE_SWITCH[ctx.window.current_language_name]))
+
+@scenario("save")
+def bench_save(ctx):
+    path = os.path.join(ctx.work_dir, "saved.trace")
+    return ctx.measure(lambda: ctx.window.do_save(path))
+
+@scenario("export_html")
+def bench_export_html(ctx):
+    from export import EditorRows, export_trace
+    path = os.path.join(ctx.work_dir, "exported.html")
+    theme = ctx.window.themes[ctx.window.current_theme]
+    return ctx.measure(lambda: export_trace(EditorRows(ctx.editor), path, ctx.editor.lexer(), theme))
+
+
+def run_case(app, scenario_name, lines, language, mix_name, repeat, work_dir, profile):
+    from main import MainWindow
+
+    trace_path = os.path.join(work_dir, f"{language.replace('+', 'p')}_{mix_name}_{lines}.trace")
+    if not os.path.exists(trace_path):
+        write_trace(trace_path, lines, language, MIXES[mix_name])
+
+    window = MainWindow()
+    window.resize(800, 600)
+    window.show()
+    window.load_trace_file(trace_path)
+    ctx = BenchContext(app, window, trace_path, work_dir, repeat)
+    ctx.settle()
+
+    recorder.clear()
+    recorder.enabled = profile
+    durations = SCENARIOS[scenario_name](ctx)
+    recorder.enabled = False
+
+    result = {
+        "scenario": scenario_name,
+        "lines": lines,
+        "language": language,
+        "mix": mix_name,
+        "runs_ms": durations,
+        "median_ms": statistics.median(durations),
+        "min_ms": min(durations),
+        "max_ms": max(durations),
+    }
+    if profile:
+        result["profile"] = [{k: v for k, v in row.items() if k != "histogram"}
+                             for row in recorder.summary()]
+
+    window.unsaved_changes = False
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+    return result
+
+def case_key(result):
+    return (result["scenario"], result["lines"], result["language"], result["mix"])
+
+def compare(baseline, current, threshold, noise_floor_ms):
+    """
+    Return the cases whose median got slower than the baseline by more than
+    `threshold` (a fraction) and by at least `noise_floor_ms`.
+    """
+    previous = {case_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = previous.get(case_key(result))
+        if old is None:
+            continue
+        delta = result["median_ms"] - old["median_ms"]
+        if delta > noise_floor_ms and result["median_ms"] > old["median_ms"] * (1 + threshold):
+            regressions.append({
+                "case": case_key(result),
+                "baseline_ms": old["median_ms"],
+                "current_ms": result["median_ms"],
+                "ratio": result["median_ms"] / old["median_ms"] if old["median_ms"] else float("inf")
+            })
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless editor benchmarks on synthetic traces.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--languages", nargs="+", default=["Python"], choices=sorted(LANGUAGE_SWITCH))
+    parser.add_argument("--mixes", nargs="+", default=["mixed"], choices=sorted(MIXES))
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="baseline results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown fraction")
+    parser.add_argument("--noise-floor", type=float, default=1.0, help="ignore slowdowns below this many ms")
+    parser.add_argument("--profile", action="store_true", help="include per-function timings from perf")
+    parser.add_argument("--work-dir", help="where generated traces are kept (default: temp dir)")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="trace_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+
+    results = []
+    for lines in args.sizes:
+        for language in args.languages:
+            for mix_name in args.mixes:
+                for scenario_name in args.scenarios:
+                    result = run_case(app, scenario_name, lines, language, mix_name,
+                                      args.repeat, work_dir, args.profile)
+                    results.append(result)
+                    print(f"{scenario_name:18} {language:7} {mix_name:6} {lines:>8} lines  "
+                          f"median {result['median_ms']:10.2f} ms  max {result['max_ms']:10.2f} ms")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "qt": QT_VERSION_STR,
+            "qscintilla": QSCINTILLA_VERSION_STR,
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": args.repeat,
+        },
+        "results": results
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold, args.noise_floor)
+        for reg in regressions:
+            scenario_name, lines, language, mix_name = reg["case"]
+            print(f"REGRESSION {scenario_name} {language} {mix_name} {lines}: "
+                  f"{reg['baseline_ms']:.2f} ms -> {reg['current_ms']:.2f} ms (x{reg['ratio']:.2f})")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
+import re
 from PyQt5.Qsci import QsciLexerCustom
 from themes import LightTheme, DarkTheme
 from enum import Enum
+from perf import timed
+
+BRACES = re.compile(r"[{}]")
 
 class LineType(Enum):
     CODE = 0
@@ -8,9 +12,15 @@ class LineType(Enum):
     FILE_ANNOTATION = 2
 
 class RowData:
-    def __init__(self, tabs=0, line_type=LineType.CODE):
-        self.tabs = tabs
+    def __init__(self, line_type=LineType.CODE):
         self.line_type = line_type
+        # Brace folding only: (column, "{" or "}") of the line's code braces
+        # (None = not scanned yet), brace depth before the line, the depth
+        # the line itself folds at, and the lowest depth it reaches
+        self.braces = None
+        self.depth = 0
+        self.fold_depth = 0
+        self.low = 0
 
 class BaseLexer(QsciLexerCustom):
     CODE_DEFAULT_STYLE   = 0
@@ -26,8 +36,31 @@ class BaseLexer(QsciLexerCustom):
     CODE_BOOL_STYLE      = 10
     CODE_IMPORT_STYLE    = 11
 
+    # Tokens of a CODE line, classified by match_style(); None styles the
+    # whole line as default. Every alternative must either fail on its first
+    # character or match everything it scans (unterminated strings and
+    # comments run to the end of the line), so a line is tokenized in linear
+    # time whatever it contains; tokenizer_fuzz.py checks this.
+    TOKEN_REGEX = None
+
+    # Only the first LONG_LINE characters of a CODE line are tokenized, the
+    # rest of a minified blob or huge log line is styled as default
+    LONG_LINE = 2048
+
+    # code_runs() results kept for the most recent distinct lines, so the
+    # styling, the minimap and the exporters tokenize a new row only once
+    RECENT_RUNS = 4096
+
+    # Fold code by {} nesting instead of indentation
+    BRACE_FOLDING = False
+
+    # Bump when the styles a lexer produces change: saved style snapshots
+    # (snapshot_cache.py) made by an older version are then ignored
+    VERSION = 2
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.recent_runs = {}
         self.themes = {
             "Light": LightTheme(),
             "Dark": DarkTheme()
@@ -57,13 +90,38 @@ class BaseLexer(QsciLexerCustom):
         if style == self.CODE_IMPORT_STYLE:     return "Code: Import"
         return ""
 
+    @timed()
     def styleText(self, start, end):
         editor = self.parent()
         if not editor:
             return
-        num_lines = editor.lines()
+        # Scintilla can ask for styling in the middle of an edit, before
+        # row_data has caught up; the next paint asks again
+        if len(editor.row_data) != editor.lines():
+            return
+        # Lines are styled independently, so only the requested range is
+        # restyled; styleText(0, 0) restyles the whole document
+        if end > start:
+            first = editor.SendScintilla(editor.SCI_LINEFROMPOSITION, start)
+            last = editor.SendScintilla(editor.SCI_LINEFROMPOSITION, end)
+        else:
+            first, last = 0, editor.lines() - 1
+        self.style_lines(first, last)
 
-        for line in range(num_lines):
+    def restyle_lines(self, first, last):
+        """
+        Restyle lines outside a styleText() request, e.g. after a line-type
+        change. Scintilla's end-of-styling mark is put back afterwards so any
+        styling it still owes earlier text is not skipped.
+        """
+        editor = self.parent()
+        end_styled = editor.SendScintilla(editor.SCI_GETENDSTYLED)
+        self.style_lines(first, last)
+        self.startStyling(end_styled)
+
+    def style_lines(self, first, last):
+        editor = self.parent()
+        for line in range(first, last + 1):
             line_type = editor.row_data[line].line_type
             text_line = editor.text(line)
 
@@ -88,9 +146,86 @@ class BaseLexer(QsciLexerCustom):
         self.startStyling(pos)
         self.setStyling(length, self.TEXT_NOTE_STYLE)
 
+    @timed()
     def style_code_line(self, line, text):
         editor = self.parent()
-        pos = editor.positionFromLineIndex(line, 0)
-        length = editor.lineLength(line)
-        self.startStyling(pos)
-        self.setStyling(length, self.CODE_DEFAULT_STYLE)
\ No newline at end of file
+        self.startStyling(editor.positionFromLineIndex(line, 0))
+        for start, end, style in self.code_runs(text):
+            self.setStyling(end - start, style)
+
+    def code_runs(self, text):
+        """
+        (start, end, style) runs covering a CODE line, from TOKEN_REGEX and
+        match_style(); adjacent tokens of the same style share one run.
+        Shared by the editor's styling, the minimap and the exporters, which
+        must not modify the returned list.
+        """
+        runs = self.recent_runs.get(text)
+        if runs is None:
+            if len(self.recent_runs) >= self.RECENT_RUNS:
+                self.recent_runs.clear()
+            runs = self.recent_runs[text] = self.scan_runs(text)
+        return runs
+
+    def scan_runs(self, text):
+        """
+        code_runs() of `text`, tokenized afresh.
+        """
+        if not text:
+            return []
+        if self.TOKEN_REGEX is None:
+            return [(0, len(text), self.CODE_DEFAULT_STYLE)]
+        default = self.CODE_DEFAULT_STYLE
+        runs = []
+        run_start, run_style = 0, default
+        position = 0
+        for match in self.TOKEN_REGEX.finditer(text, 0, self.LONG_LINE):
+            start, end = match.span()
+            style = self.match_style(match)
+            if start > position and run_style != default:
+                runs.append((run_start, position, run_style))
+                run_start, run_style = position, default
+            if style != run_style:
+                if start > run_start:
+                    runs.append((run_start, start, run_style))
+                run_start, run_style = start, style
+            position = end
+        if len(text) > position and run_style != default:
+            runs.append((run_start, position, run_style))
+            run_start, run_style = position, default
+        runs.append((run_start, len(text), run_style))
+        return runs
+
+    def match_style(self, match):
+        """
+        Style of a TOKEN_REGEX match, by default token_style() of its text.
+        """
+        return self.token_style(match.group(0))
+
+    def token_style(self, token):
+        return self.CODE_DEFAULT_STYLE
+
+    def code_identifiers(self, text):
+        """
+        (start, end, name) of the identifier tokens of a CODE line that are
+        styled as plain code, i.e. not keywords or built-ins.
+        """
+        if self.TOKEN_REGEX is None:
+            return []
+        return [(match.start(), match.end(), match.group())
+                for match in self.TOKEN_REGEX.finditer(text, 0, self.LONG_LINE)
+                if match.group().isidentifier() and self.match_style(match) == self.CODE_DEFAULT_STYLE]
+
+    def code_braces(self, text):
+        """
+        (column, brace) of the { and } in a CODE line that are code, i.e. not
+        inside a string, char literal or comment token, nor past LONG_LINE.
+        """
+        if "{" not in text and "}" not in text:
+            return ()
+        braces = []
+        for start, end, style in self.code_runs(text):
+            if style == self.CODE_DEFAULT_STYLE:
+                for match in BRACES.finditer(text, start, min(end, self.LONG_LINE)):
+                    braces.append((match.start(), match.group()))
+        return tuple(braces)
@@ -0,0 +1,185 @@
+# diff_view.py
+
+import os
+import time
+from bisect import bisect_left, bisect_right
+from PyQt5.QtWidgets import QMainWindow, QSplitter, QAction, QLabel
+from PyQt5.Qsci import QsciScintilla
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QKeySequence
+
+from semantic_editor import SemanticEditor
+from lexers import lexer_for
+from themes import LightTheme, DarkTheme
+from trace_diff import read_trace_rows, diff_rows, EQUAL, DELETE, INSERT, REPLACE
+
+class DiffSide:
+    """
+    One document in a comparison: its (line_type, tabs, text) rows plus the
+    settings needed to show it.
+    """
+    def __init__(self, name, rows, language="Python", tab_size=4):
+        self.name = name
+        self.rows = rows
+        self.language = language
+        self.tab_size = tab_size
+
+    @classmethod
+    def from_trace_data(cls, name, data, rows):
+        return cls(name, rows, data.get("language", "Python"), data.get("tab_size", 4))
+
+    @classmethod
+    def from_editor(cls, name, editor, language):
+        lines = editor.text().split("\n")
+        rows = [(rd.line_type.value, tabs, text)
+                for rd, tabs, text in zip(editor.row_data, editor.tabs, lines)]
+        return cls(name, rows, language, editor.spaces_per_tab)
+
+
+class DiffWindow(QMainWindow):
+    """
+    Side-by-side comparison of two traces, line types included. Changed
+    rows get a background marker; scrolling either side keeps the other on
+    the matching line. Both editors are read-only and styled lazily, so
+    only the rows on screen are ever styled.
+    """
+    DELETE_MARKER = 20
+    INSERT_MARKER = 21
+    REPLACE_MARKER = 22
+    GAP_MARKER = 23  # underlines the row after which the other side has extra rows
+    CONTEXT_LINES = 3
+
+    def __init__(self, left, right, theme_name="Dark", parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setWindowTitle(f"Compare {left.name} ↔ {right.name}")
+        self.theme = {"Light": LightTheme(), "Dark": DarkTheme()}[theme_name]
+        self.syncing = False
+
+        self.left_editor = self.make_editor(left, theme_name)
+        self.right_editor = self.make_editor(right, theme_name)
+        splitter = QSplitter(Qt.Horizontal, self)
+        splitter.addWidget(self.left_editor)
+        splitter.addWidget(self.right_editor)
+        self.setCentralWidget(splitter)
+
+        start = time.perf_counter()
+        self.opcodes = diff_rows(left.rows, right.rows)
+        elapsed = time.perf_counter() - start
+        self.hunks = [op for op in self.opcodes if op[0] != EQUAL]
+        self.starts_left = [op[1] for op in self.opcodes]
+        self.starts_right = [op[3] for op in self.opcodes]
+        self.mark_hunks()
+
+        navigate_menu = self.menuBar().addMenu("Navigate")
+        next_action = QAction("Next Difference", self)
+        next_action.setShortcut(QKeySequence("Alt+Down"))
+        next_action.triggered.connect(lambda: self.go_to_hunk(1))
+        navigate_menu.addAction(next_action)
+
+        previous_action = QAction("Previous Difference", self)
+        previous_action.setShortcut(QKeySequence("Alt+Up"))
+        previous_action.triggered.connect(lambda: self.go_to_hunk(-1))
+        navigate_menu.addAction(previous_action)
+
+        removed = sum(a1 - a0 for _, a0, a1, _, _ in self.hunks)
+        added = sum(b1 - b0 for _, _, _, b0, b1 in self.hunks)
+        self.statusBar().addWidget(QLabel(
+            f"{len(self.hunks)} differences, -{removed} +{added} rows ({elapsed:.2f} s)"))
+
+        # SCN_UPDATEUI also reports scrolling done by Scintilla itself, which
+        # the scroll bars' valueChanged does not
+        self.left_editor.SCN_UPDATEUI.connect(
+            lambda updated: self.sync_scroll(self.left_editor, self.right_editor, True, updated))
+        self.right_editor.SCN_UPDATEUI.connect(
+            lambda updated: self.sync_scroll(self.right_editor, self.left_editor, False, updated))
+
+        self.theme.apply_to_window(self)
+
+    def make_editor(self, side, theme_name):
+        editor = SemanticEditor(self)
+        editor.setFolding(QsciScintilla.NoFoldStyle)
+        lexer = lexer_for(side.language, editor)
+        lexer.set_theme(theme_name)
+        editor.setLexer(lexer)
+        editor.load_rows("\n".join(text for _, _, text in side.rows),
+                         [(line_type, tabs) for line_type, tabs, _ in side.rows], side.tab_size)
+        editor.setMarginWidth(0, "0" * (len(str(len(side.rows))) + 1))
+        editor.setCursorPosition(0, 0)
+        editor.setReadOnly(True)
+
+        for marker, color in ((self.DELETE_MARKER, self.theme.diff_delete_bg),
+                              (self.INSERT_MARKER, self.theme.diff_insert_bg),
+                              (self.REPLACE_MARKER, self.theme.diff_replace_bg)):
+            editor.markerDefine(QsciScintilla.Background, marker)
+            editor.setMarkerBackgroundColor(color, marker)
+        editor.markerDefine(QsciScintilla.Underline, self.GAP_MARKER)
+        editor.setMarkerBackgroundColor(self.theme.diff_insert_bg.lighter(160), self.GAP_MARKER)
+        return editor
+
+    def mark_hunks(self):
+        markers = {DELETE: self.DELETE_MARKER, INSERT: self.INSERT_MARKER, REPLACE: self.REPLACE_MARKER}
+        for tag, a0, a1, b0, b1 in self.hunks:
+            for editor, first, last in ((self.left_editor, a0, a1), (self.right_editor, b0, b1)):
+                if first == last:
+                    if first > 0:
+                        editor.SendScintilla(QsciScintilla.SCI_MARKERADD, first - 1, self.GAP_MARKER)
+                    continue
+                for line in range(first, last):
+                    editor.SendScintilla(QsciScintilla.SCI_MARKERADD, line, markers[tag])
+
+    def map_line(self, line, from_left):
+        """
+        The row on the other side that corresponds to `line`: its partner in
+        an equal run, or the matching offset into (or the end of) a hunk.
+        """
+        if not self.opcodes:
+            return 0
+        starts = self.starts_left if from_left else self.starts_right
+        index = max(bisect_right(starts, line) - 1, 0)
+        tag, a0, a1, b0, b1 = self.opcodes[index]
+        source_start, target_start, target_end = (a0, b0, b1) if from_left else (b0, a0, a1)
+        if tag == EQUAL:
+            return target_start + line - source_start
+        return min(target_start + line - source_start, max(target_end - 1, target_start))
+
+    def sync_scroll(self, source, target, from_left, updated):
+        if self.syncing:
+            return
+        self.syncing = True
+        if updated & QsciScintilla.SC_UPDATE_V_SCROLL:
+            line = source.SendScintilla(QsciScintilla.SCI_DOCLINEFROMVISIBLE, source.firstVisibleLine())
+            mapped = self.map_line(line, from_left)
+            target.setFirstVisibleLine(target.SendScintilla(QsciScintilla.SCI_VISIBLEFROMDOCLINE, mapped))
+        if updated & QsciScintilla.SC_UPDATE_H_SCROLL:
+            target.SendScintilla(QsciScintilla.SCI_SETXOFFSET,
+                                 source.SendScintilla(QsciScintilla.SCI_GETXOFFSET))
+        self.syncing = False
+
+    def go_to_hunk(self, direction):
+        if not self.hunks:
+            return
+        current, _ = self.left_editor.getCursorPosition()
+        starts = [a0 for _, a0, _, _, _ in self.hunks]
+        index = bisect_right(starts, current) if direction > 0 else bisect_left(starts, current) - 1
+        if not 0 <= index < len(self.hunks):
+            return
+        _, a0, _, b0, _ = self.hunks[index]
+        self.syncing = True
+        for editor, line in ((self.left_editor, a0), (self.right_editor, b0)):
+            line = min(line, editor.lines() - 1)
+            editor.setCursorPosition(line, 0)
+            editor.setFirstVisibleLine(max(line - self.CONTEXT_LINES, 0))
+        self.syncing = False
+        self.statusBar().showMessage(f"Difference {index + 1} of {len(self.hunks)}", 3000)
+
+
+def compare_traces(left, right, theme_name="Dark", parent=None):
+    window = DiffWindow(left, right, theme_name, parent)
+    window.resize(1200, 700)
+    window.show()
+    return window
+
+def side_from_file(filename):
+    data, rows = read_trace_rows(filename)
+    return DiffSide.from_trace_data(os.path.basename(filename), data, rows)
@@ -0,0 +1,229 @@
+# export.py
+
+import argparse
+import html
+import os
+import re
+import sys
+
+from core_lexer import LineType
+from languages import LANGUAGES
+from trace_archive import read_trace_data
+
+BACKTICK_RUNS = re.compile(r"`+")
+
+class EditorRows:
+    """
+    (LineType, text) rows of an open SemanticEditor, read one line at a time.
+    """
+    def __init__(self, editor):
+        self.editor = editor
+
+    def __iter__(self):
+        editor = self.editor
+        for line, rd in enumerate(editor.row_data):
+            yield rd.line_type, editor.text(line).rstrip("\r\n")
+
+
+class TraceRows:
+    """
+    (LineType, text) rows of a loaded .trace document. Lines are sliced out
+    of its text as they are needed instead of splitting it up front.
+    """
+    def __init__(self, data):
+        self.text = data.get("text", "")
+        self.row_data = data.get("row_data", [])
+
+    def __iter__(self):
+        text = self.text
+        row_data = self.row_data
+        start = 0
+        line = 0
+        while True:
+            end = text.find("\n", start)
+            line_text = text[start:] if end < 0 else text[start:end]
+            line_type = row_data[line].get("line_type", 0) if line < len(row_data) else 0
+            yield LineType(line_type), line_text.rstrip("\r")
+            if end < 0:
+                return
+            start = end + 1
+            line += 1
+
+
+class ChunkedWriter:
+    """
+    Collects output pieces and writes them out every CHUNK_ROWS rows, so an
+    export holds at most one chunk in memory whatever the trace size.
+    """
+    CHUNK_ROWS = 4096
+
+    def __init__(self, out):
+        self.out = out
+        self.parts = []
+        self.rows = 0
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def end_row(self):
+        self.rows += 1
+        if self.rows % self.CHUNK_ROWS == 0:
+            self.flush()
+
+    def flush(self):
+        self.out.write("".join(self.parts))
+        self.parts = []
+
+
+def style_classes(lexer, theme):
+    """
+    Map lexer style ids to the CSS class named after their Theme.styles key.
+    """
+    return {getattr(lexer, f"{name.upper()}_STYLE"): name for name in theme.styles}
+
+def theme_css(theme, tab_size):
+    default = theme.styles["code_default"]
+    rules = [
+        f"body {{ margin: 0; background: {theme.window_bg.name()}; color: {theme.window_fg.name()}; }}",
+        f"pre.trace {{ margin: 0; padding: 1em; font-family: \"Courier New\", monospace; font-size: 10pt; "
+        f"tab-size: {tab_size}; color: {default['color'].name()}; background: {default['paper'].name()}; }}"
+    ]
+    for name, style in theme.styles.items():
+        declarations = [f"color: {style['color'].name()}", f"background: {style['paper'].name()}"]
+        font = style.get("font")
+        if font is not None:
+            if font.bold():
+                declarations.append("font-weight: bold")
+            if font.italic():
+                declarations.append("font-style: italic")
+        rules.append(f".{name} {{ {'; '.join(declarations)}; }}")
+    return "\n".join(rules)
+
+def export_html(rows, lexer, theme, out, title="Trace", tab_size=4):
+    """
+    Write rows as a standalone HTML page, styled with CSS classes generated
+    from the theme. Returns the number of rows written.
+    """
+    classes = style_classes(lexer, theme)
+    note_class = classes[lexer.TEXT_NOTE_STYLE]
+    file_class = classes[lexer.FILE_ANNOTATION_STYLE]
+    default_style = lexer.CODE_DEFAULT_STYLE
+    escape = html.escape
+
+    writer = ChunkedWriter(out)
+    writer.write(
+        "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<title>{escape(title)}</title>\n<style>\n{theme_css(theme, tab_size)}\n</style>\n"
+        "</head>\n<body>\n<pre class=\"trace\">")
+    for line_type, text in rows:
+        if line_type == LineType.FILE_ANNOTATION:
+            writer.write(f"<span class=\"{file_class}\">{escape(text, False)}</span>\n")
+        elif line_type == LineType.TEXT:
+            writer.write(f"<span class=\"{note_class}\">{escape(text, False)}</span>\n")
+        else:
+            for start, end, style in lexer.code_runs(text):
+                piece = escape(text[start:end], False)
+                if style == default_style:
+                    writer.write(piece)
+                else:
+                    writer.write(f"<span class=\"{classes[style]}\">{piece}</span>")
+            writer.write("\n")
+        writer.end_row()
+    writer.write("</pre>\n</body>\n</html>\n")
+    writer.flush()
+    return writer.rows
+
+def code_fence(rows):
+    """
+    A backtick fence longer than any backtick run that starts a CODE line,
+    so no trace line can close its block early.
+    """
+    longest = 0
+    for line_type, text in rows:
+        if line_type == LineType.CODE:
+            stripped = text.lstrip(" ")
+            if stripped.startswith("`"):
+                longest = max(longest, len(stripped) - len(stripped.lstrip("`")))
+    return "`" * max(3, longest + 1)
+
+def code_span(text):
+    """
+    `text` as a Markdown code span: delimited by one backtick more than its
+    longest backtick run, and padded with spaces when it starts or ends with
+    a backtick (one space is stripped from each side of a code span).
+    """
+    ticks = "`" * (max(map(len, BACKTICK_RUNS.findall(text)), default=0) + 1)
+    if text.startswith("`") or text.endswith("`"):
+        text = f" {text} "
+    return f"{ticks}{text}{ticks}"
+
+def export_markdown(rows, language, out):
+    """
+    Write rows as Markdown: CODE runs as fenced blocks, TEXT notes as block
+    quotes and FILE_ANNOTATION lines as headings. `rows` is read twice, once
+    to size the code fence. Returns the number of rows written.
+    """
+    fence = code_fence(rows)
+    info = LANGUAGES[language].markdown if language in LANGUAGES else ""
+
+    writer = ChunkedWriter(out)
+    block = None  # LineType of the block being written
+    for line_type, text in rows:
+        if line_type != block:
+            if block == LineType.CODE:
+                writer.write(f"{fence}\n\n")
+            elif block == LineType.TEXT:
+                writer.write("\n")
+            if line_type == LineType.CODE:
+                writer.write(f"{fence}{info}\n")
+            block = line_type
+
+        if line_type == LineType.FILE_ANNOTATION:
+            writer.write(f"#### {code_span(text.strip())}\n\n")
+            block = None
+        elif line_type == LineType.TEXT:
+            writer.write(f"> {text.strip()}\n" if text.strip() else ">\n")
+        else:
+            writer.write(f"{text}\n")
+        writer.end_row()
+    if block == LineType.CODE:
+        writer.write(f"{fence}\n")
+    writer.flush()
+    return writer.rows
+
+def export_trace(rows, filename, lexer, theme, fmt=None, title=None, tab_size=4):
+    """
+    Export rows to `filename` as "html" or "md" (by default from the file
+    extension). Returns the number of rows written.
+    """
+    fmt = fmt or ("md" if filename.lower().endswith((".md", ".markdown")) else "html")
+    with open(filename, "w", encoding="utf-8", newline="\n") as out:
+        if fmt == "md":
+            return export_markdown(rows, lexer.language(), out)
+        return export_html(rows, lexer, theme, out, title or os.path.basename(filename), tab_size)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a .trace file or archive as HTML or Markdown.")
+    parser.add_argument("trace")
+    parser.add_argument("-o", "--output", help="output file (default: the trace name with .html/.md)")
+    parser.add_argument("--format", choices=["html", "md"], help="default: from the output extension")
+    parser.add_argument("--theme", choices=["Dark", "Light"], help="default: the trace's own theme")
+    args = parser.parse_args()
+
+    # Lexers and themes need a QApplication, but nothing is shown
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv)
+    from lexers import lexer_for
+    from themes import LightTheme, DarkTheme
+
+    data = read_trace_data(args.trace)
+    output = args.output or os.path.splitext(args.trace)[0] + "." + (args.format or "html")
+    theme = LightTheme() if (args.theme or data.get("theme", "Dark")) == "Light" else DarkTheme()
+    lexer = lexer_for(data.get("language", "Python"))
+    count = export_trace(TraceRows(data), output, lexer, theme, args.format,
+                         os.path.basename(args.trace), data.get("tab_size", 4))
+    print(f"{count} rows written to {output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# follow.py
+
+import json
+import os
+import time
+from PyQt5.Qsci import QsciScintilla
+from PyQt5.QtCore import QObject, QTimer, QFileSystemWatcher
+from core_lexer import LineType
+
+class TraceFollower(QObject):
+    """
+    Tails a growing file into a SemanticEditor. Each line is either a trace
+    stream row, [line_type, tabs, "text"] as written by `tracer.py --stream`,
+    or plain text, which becomes a CODE row. Only the appended bytes are read,
+    in bounded chunks, and their rows are appended a slice at a time so the
+    UI keeps breathing during large bursts.
+    """
+    CHUNK_BYTES = 512 * 1024
+    # Rows appended per event-loop turn, at most SLICE_ROWS or about SLICE_MS,
+    # in batches of at least BATCH_ROWS
+    SLICE_ROWS = 2000
+    SLICE_MS = 16
+    BATCH_ROWS = 50
+    COALESCE_MS = 20
+    POLL_MS = 1000  # fallback for file systems without change notifications
+
+    def __init__(self, editor, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.filename = None
+        self.offset = 0
+        self.partial = b""
+        self.backlog = []      # complete lines read but not appended yet
+        self.backlog_start = 0
+        self.size = 0
+        self.catching_up = False
+        self.scroll_to_end = False
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_file_changed)
+
+        self.read_timer = QTimer(self)
+        self.read_timer.setSingleShot(True)
+        self.read_timer.timeout.connect(self.read_appended)
+
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(self.POLL_MS)
+        self.poll_timer.timeout.connect(self.read_appended)
+
+    def is_following(self):
+        return self.filename is not None
+
+    def start(self, filename):
+        self.stop()
+        self.filename = filename
+        self.offset = 0
+        self.partial = b""
+        self.backlog = []
+        self.backlog_start = 0
+        self.size = 0
+        self.catching_up = False
+        self.watcher.addPath(filename)
+        self.poll_timer.start()
+        self.read_timer.start(0)
+
+    def stop(self):
+        if self.filename is None:
+            return
+        self.watcher.removePaths(self.watcher.files())
+        self.poll_timer.stop()
+        self.read_timer.stop()
+        self.filename = None
+
+    def on_file_changed(self, path):
+        # Writers that replace the file drop it from the watcher
+        if path not in self.watcher.files() and os.path.exists(path):
+            self.watcher.addPath(path)
+        if not self.read_timer.isActive():
+            self.read_timer.start(self.COALESCE_MS)
+
+    def read_chunk(self):
+        """
+        Read the next chunk of appended bytes into the backlog.
+        """
+        try:
+            size = os.path.getsize(self.filename)
+        except OSError:
+            return
+        self.size = size
+        if size < self.offset:
+            # Truncated or rotated: continue from the start of the new content
+            self.offset = 0
+            self.partial = b""
+        if size == self.offset:
+            return
+
+        with open(self.filename, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(self.CHUNK_BYTES)
+        self.offset += len(data)
+
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()
+        self.backlog = lines
+        self.backlog_start = 0
+
+    def read_appended(self):
+        if self.filename is None:
+            return
+        if self.backlog_start >= len(self.backlog):
+            self.read_chunk()
+
+        if not self.catching_up:
+            # Follow the end if the view was there when this burst began;
+            # scrolling is left until the backlog is drained, so rows nobody
+            # is looking at are not styled along the way
+            scroll_bar = self.editor.verticalScrollBar()
+            self.scroll_to_end = scroll_bar.value() >= scroll_bar.maximum()
+            self.catching_up = True
+
+        backlog = self.backlog
+        deadline = time.perf_counter() + self.SLICE_MS / 1000
+        end = min(self.backlog_start + self.SLICE_ROWS, len(backlog))
+        styled = not self.scroll_to_end
+        batch_rows = self.BATCH_ROWS
+        while time.perf_counter() < deadline:
+            if not styled:
+                styled = self.style_ahead()
+            elif self.backlog_start < end:
+                started = time.perf_counter()
+                batch = backlog[self.backlog_start:min(self.backlog_start + batch_rows, end)]
+                self.editor.append_rows([self.parse_line(line) for line in batch])
+                # Fold and publish the rows now, so their rowsChanged
+                # consumers count against this slice too
+                self.editor.update_changed_rows()
+                self.backlog_start += len(batch)
+                styled = not self.scroll_to_end
+                # Each batch has a fixed cost (folding, consumers), so the
+                # next one is sized to fill what is left of the slice, going
+                # by this batch's time per row
+                now = time.perf_counter()
+                row_seconds = (now - started) / len(batch)
+                batch_rows = max(self.BATCH_ROWS, int((deadline - now) / max(row_seconds, 1e-6)))
+            else:
+                break
+
+        if not styled or self.backlog_start < len(backlog) or self.offset < self.size:
+            # More is waiting; let the event loop run before the next slice
+            self.read_timer.start(0)
+            return
+        self.backlog = []
+        self.backlog_start = 0
+        self.catching_up = False
+        if self.scroll_to_end:
+            scroll_bar = self.editor.verticalScrollBar()
+            scroll_bar.setValue(scroll_bar.maximum())
+
+    def style_ahead(self):
+        """
+        Style the next BATCH_ROWS rows Scintilla has not styled yet, so that
+        scrolling to the end does not leave it the whole burst to style at
+        once. Returns True once everything is styled, or when the lexer
+        makes no progress (it skips styling while rows are out of step).
+        """
+        editor = self.editor
+        end_styled = editor.SendScintilla(QsciScintilla.SCI_GETENDSTYLED)
+        if end_styled >= editor.length():
+            return True
+        line = editor.SendScintilla(QsciScintilla.SCI_LINEFROMPOSITION, end_styled) + self.BATCH_ROWS
+        end = editor.positionFromLineIndex(line, 0) if line < editor.lines() else editor.length()
+        editor.SendScintilla(QsciScintilla.SCI_COLOURISE, end_styled, end)
+        return editor.SendScintilla(QsciScintilla.SCI_GETENDSTYLED) <= end_styled
+
+    @staticmethod
+    def parse_line(raw):
+        """
+        (line_type, text) of one streamed line. Anything that is not a
+        well-formed stream row, such as a JSON array of other values, is
+        taken as plain text.
+        """
+        text = raw.decode("utf-8", errors="replace").rstrip("\r")
+        if text.startswith("["):
+            try:
+                line_type, _tabs, row_text = json.loads(text)
+                line_type = LineType(line_type)
+            except (ValueError, TypeError):
+                pass
+            else:
+                if isinstance(row_text, str):
+                    return line_type, row_text
+        return LineType.CODE, text
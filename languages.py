@@ -0,0 +1,98 @@
+# languages.py
+
+import builtins
+import keyword
+
+from core_lexer import BaseLexer
+
+class Language:
+    """
+    Declarative description of a trace language. lexers.lexer_class()
+    compiles it into a BaseLexer subclass the first time it is used.
+
+    keywords: (style id, words) groups; a word in several groups takes the
+        style of the first one
+    line_comments: prefixes that comment out the rest of the line
+    block_comments: (open, close) delimiters; an unclosed one runs to the
+        end of the line
+    strings: quote characters, backslash-escaped; an unclosed string runs to
+        the end of the line
+    markdown: info string of the language's fenced code blocks
+    """
+    def __init__(self, name, keywords=(), line_comments=(), block_comments=(),
+                 strings=('"', "'"), brace_folding=False, markdown=""):
+        self.name = name
+        self.keywords = tuple((style, frozenset(words)) for style, words in keywords)
+        self.line_comments = tuple(line_comments)
+        self.block_comments = tuple(block_comments)
+        self.strings = tuple(strings)
+        self.brace_folding = brace_folding
+        self.markdown = markdown
+
+
+PYTHON_CONTROL = {
+    "if", "elif", "else", "while", "for", "break",
+    "continue", "return", "try", "raise", "except",
+    "finally", "with", "as", "pass"
+}
+PYTHON_DEFCLASS = {"def", "class", "lambda"}
+PYTHON_BOOL = {"True", "False", "None"}
+PYTHON_IMPORT = {"import", "from"}
+
+PYTHON = Language(
+    "Python",
+    keywords=[
+        (BaseLexer.CODE_CONTROL_STYLE, PYTHON_CONTROL),
+        (BaseLexer.CODE_DEFCLASS_STYLE, PYTHON_DEFCLASS),
+        (BaseLexer.CODE_BUILTIN_STYLE, {b for b in dir(builtins) if not b.startswith("_")}),
+        (BaseLexer.CODE_BOOL_STYLE, PYTHON_BOOL),
+        (BaseLexer.CODE_IMPORT_STYLE, PYTHON_IMPORT),
+        (BaseLexer.CODE_KEYWORD_STYLE, set(keyword.kwlist)),
+    ],
+    line_comments=["#"],
+    markdown="python",
+)
+
+CPP = Language(
+    "C++",
+    keywords=[
+        (BaseLexer.CODE_KEYWORD_STYLE, {
+            "auto", "bool", "break", "case", "catch", "char", "class", "const",
+            "continue", "default", "delete", "do", "double", "else", "enum",
+            "explicit", "extern", "false", "float", "for", "friend", "goto",
+            "if", "inline", "int", "long", "namespace", "new", "operator",
+            "private", "protected", "public", "return", "short", "signed",
+            "sizeof", "static", "struct", "switch", "template", "this", "throw",
+            "true", "try", "typedef", "typename", "union", "unsigned", "using",
+            "virtual", "void", "volatile", "while"
+        }),
+    ],
+    line_comments=["//"],
+    block_comments=[("/*", "*/")],
+    brace_folding=True,
+    markdown="cpp",
+)
+
+JAVA = Language(
+    "Java",
+    keywords=[
+        (BaseLexer.CODE_KEYWORD_STYLE, {
+            "abstract", "assert", "boolean", "break", "byte", "case", "catch",
+            "char", "class", "const", "continue", "default", "do", "double",
+            "else", "enum", "extends", "final", "finally", "float", "for",
+            "goto", "if", "implements", "import", "instanceof", "int",
+            "interface", "long", "native", "new", "package", "private",
+            "protected", "public", "return", "short", "static", "strictfp",
+            "super", "switch", "synchronized", "this", "throw", "throws",
+            "transient", "try", "void", "volatile", "while", "true", "false", "null"
+        }),
+    ],
+    line_comments=["//"],
+    block_comments=[("/*", "*/")],
+    brace_folding=True,
+    markdown="java",
+)
+
+# In Language menu order
+LANGUAGES = {language.name: language for language in (PYTHON, CPP, JAVA)}
+DEFAULT_LANGUAGE = "Python"
@@ -0,0 +1,98 @@
+# lexers.py
+
+import re
+import zlib
+
+from core_lexer import BaseLexer
+from languages import LANGUAGES, DEFAULT_LANGUAGE
+
+IDENTIFIER = r"[a-zA-Z_][a-zA-Z0-9_]*"
+NUMBER = r"\d+(?:\.\d+)?"
+
+class DeclarativeLexer(BaseLexer):
+    """
+    Lexer compiled from a languages.Language. TOKEN_REGEX has one named
+    group per token kind, so a token is styled by its group, and identifiers
+    by one WORD_STYLES lookup however many keyword groups the language has.
+    """
+    LANGUAGE = None
+    KIND_STYLES = {
+        "comment": BaseLexer.CODE_COMMENT_STYLE,
+        "string": BaseLexer.CODE_STRING_STYLE,
+        "number": BaseLexer.CODE_NUMBER_STYLE,
+        "other": BaseLexer.CODE_DEFAULT_STYLE,
+    }
+    WORD_STYLES = {}
+
+    def language(self):
+        return self.LANGUAGE.name
+
+    def match_style(self, match):
+        kind = match.lastgroup
+        if kind == "word":
+            return self.WORD_STYLES.get(match.group(), self.CODE_DEFAULT_STYLE)
+        return self.KIND_STYLES[kind]
+
+    def code_identifiers(self, text):
+        words = self.WORD_STYLES
+        return [(match.start(), match.end(), match.group())
+                for match in self.TOKEN_REGEX.finditer(text, 0, self.LONG_LINE)
+                if match.lastgroup == "word" and match.group() not in words]
+
+
+def token_pattern(language):
+    """
+    TOKEN_REGEX source for a Language: comments, strings, identifiers,
+    numbers and any other character, in that order of preference. Unclosed
+    comments and strings run to the end of the line, which keeps the scan
+    linear (see BaseLexer.TOKEN_REGEX).
+    """
+    comments = [re.escape(prefix) + ".*" for prefix in language.line_comments]
+    comments += [rf"{re.escape(start)}[\s\S]*?(?:{re.escape(end)}|\Z)"
+                 for start, end in language.block_comments]
+    strings = []
+    for quote in language.strings:
+        quote = re.escape(quote)
+        strings.append(rf"{quote}[^{quote}\\]*(?:\\.[^{quote}\\]*)*{quote}?")
+    kinds = [("comment", comments), ("string", strings), ("word", [IDENTIFIER]),
+             ("number", [NUMBER]), ("other", [r"\S"])]
+    return "|".join(f"(?P<{kind}>{'|'.join(alternatives)})" for kind, alternatives in kinds if alternatives)
+
+def compile_language(language):
+    """
+    A DeclarativeLexer subclass for `language`. Its VERSION includes a
+    digest of the token pattern and keywords, so editing a definition also
+    invalidates saved style snapshots.
+    """
+    pattern = token_pattern(language)
+    word_styles = {}
+    for style, words in language.keywords:
+        for word in words:
+            word_styles.setdefault(word, style)
+    digest = zlib.crc32(repr((pattern, sorted(word_styles.items()))).encode("utf-8"))
+    return type(language.name.replace("+", "p") + "Lexer", (DeclarativeLexer,), {
+        "LANGUAGE": language,
+        "TOKEN_REGEX": re.compile(pattern),
+        "WORD_STYLES": word_styles,
+        "BRACE_FOLDING": language.brace_folding,
+        "VERSION": f"{BaseLexer.VERSION}.{digest:08x}",
+    })
+
+# Language name -> compiled lexer class, filled as languages are first used
+_lexer_classes = {}
+
+def lexer_class(language):
+    """
+    The lexer class for a language name, the default language if unknown.
+    """
+    definition = LANGUAGES.get(language) or LANGUAGES[DEFAULT_LANGUAGE]
+    cls = _lexer_classes.get(definition.name)
+    if cls is None:
+        cls = _lexer_classes[definition.name] = compile_language(definition)
+    return cls
+
+def lexer_for(language, parent=None):
+    """
+    A lexer instance for a trace's language name, the default if unknown.
+    """
+    return lexer_class(language)(parent)
@@ -3,20 +3,32 @@ import os
 import json
 
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QWidget, QVBoxLayout,
-    QMenu, QAction, QShortcut, QMessageBox, QFileDialog
+    QApplication, QMainWindow, QWidget, QHBoxLayout,
+    QMenu, QAction, QShortcut, QMessageBox, QFileDialog, QProgressBar, QLabel, QInputDialog
 )
-from PyQt5.Qsci import QsciScintilla
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QKeySequence, QColor
 
 from semantic_editor import SemanticEditor
+from outline import OutlinePane
+from minimap import Minimap
+from occurrences import OccurrenceHighlighter
+from playback import TracePlayer
+from perf import PerfPane, recorder, timed
+from follow import TraceFollower
+from diff_view import DiffSide, compare_traces, side_from_file
+from export import EditorRows, export_trace
+from snapshot_cache import snapshot_key, read_snapshot, write_snapshot
+from trace_archive import TraceArchive, read_trace_data, write_archive
 from core_lexer import LineType
-from python_lexer import PythonLexer
-from cpp_lexer import CppLexer
-from java_lexer import JavaLexer
+from languages import LANGUAGES, DEFAULT_LANGUAGE
+from lexers import lexer_for
 from themes import LightTheme, DarkTheme
 
+TRACE_FILTERS = "Trace Files (*.trace *.tracez);;Trace Archives (*.tracez);;All Files (*)"
+# Rows offered by default when opening part of an archive
+ARCHIVE_ROWS = 100000
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -24,7 +36,7 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Code Trace Editor")
         self.unsaved_changes = False
         self.current_filename = "untitled.trace"
-        self.current_language_name = "Python"
+        self.current_language_name = DEFAULT_LANGUAGE
         self.current_theme = "Dark"
         self.themes = {
             "Light": LightTheme(),
@@ -34,25 +46,58 @@ class MainWindow(QMainWindow):
         # Create editor
         self.editor = SemanticEditor()
 
-        # Create language lexers
-        self.python_lexer = PythonLexer(self.editor)
-        self.cpp_lexer = CppLexer(self.editor)
-        self.java_lexer = JavaLexer(self.editor)
-
-        # Default language: Python
-        self.editor.setLexer(self.python_lexer)
+        # Language name -> lexer, created when a language is first used
+        self.lexers = {}
+        self.editor.setLexer(self.language_lexer(DEFAULT_LANGUAGE))
 
         self.language_actions = {}
         self.tabsize_actions = {}
         self.theme_actions = {}
 
+        # Overview strip of line types and styles beside the editor
+        self.minimap = Minimap(self.editor)
+
         # Layout
         central_widget = QWidget()
-        layout = QVBoxLayout()
+        layout = QHBoxLayout()
+        layout.setSpacing(0)
         layout.addWidget(self.editor)
+        layout.addWidget(self.minimap)
         central_widget.setLayout(layout)
         self.setCentralWidget(central_widget)
 
+        # Outline dock (file annotations and top-level fold headers)
+        self.outline_pane = OutlinePane(self.editor, self)
+        self.addDockWidget(Qt.LeftDockWidgetArea, self.outline_pane)
+
+        # Performance dock, hidden until recording is switched on
+        self.perf_pane = PerfPane(self)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.perf_pane)
+
+        # Live tail of a growing trace stream
+        self.follower = TraceFollower(self.editor, self)
+
+        # Background word-wrap progress, shown only while wrapping
+        self.wrap_progress = QProgressBar(self)
+        self.wrap_progress.setFormat("Wrapping %p%")
+        self.wrap_progress.setMaximumWidth(160)
+        self.wrap_progress.hide()
+        self.statusBar().addPermanentWidget(self.wrap_progress)
+        self.editor.wrapProgress.connect(self.update_wrap_progress)
+
+        # Every occurrence of the identifier at the cursor, and how many rows use it
+        self.occurrences = OccurrenceHighlighter(self.editor, self)
+        self.occurrence_label = QLabel(self)
+        self.statusBar().addPermanentWidget(self.occurrence_label)
+        self.occurrences.occurrencesChanged.connect(self.update_occurrence_label)
+
+        # Step-through playback of the CODE rows, with the current file
+        self.player = TracePlayer(self.editor, self)
+        self.playback_label = QLabel(self)
+        self.statusBar().addPermanentWidget(self.playback_label)
+        self.player.stepChanged.connect(self.update_playback_label)
+        self.playback_jump = 100
+
         # Menubar
         menubar = self.menuBar()
 
@@ -69,6 +114,10 @@ class MainWindow(QMainWindow):
         open_action.triggered.connect(self.open_file)
         file_menu.addAction(open_action)
 
+        open_range_action = QAction("Open Archive Rows…", self)
+        open_range_action.triggered.connect(self.open_archive_rows)
+        file_menu.addAction(open_range_action)
+
         save_action = QAction("Save", self)
         save_action.setShortcut(QKeySequence("Ctrl+S"))
         save_action.triggered.connect(self.save_file)
@@ -79,6 +128,24 @@ class MainWindow(QMainWindow):
         save_as_action.triggered.connect(self.save_file_as)
         file_menu.addAction(save_as_action)
 
+        export_action = QAction("Export…", self)
+        export_action.triggered.connect(self.export_file)
+        file_menu.addAction(export_action)
+
+        file_menu.addSeparator()
+        compare_action = QAction("Compare With…", self)
+        compare_action.triggered.connect(self.compare_with_file)
+        file_menu.addAction(compare_action)
+
+        follow_action = QAction("Follow File…", self)
+        follow_action.triggered.connect(self.follow_file)
+        file_menu.addAction(follow_action)
+
+        self.stop_follow_action = QAction("Stop Following", self)
+        self.stop_follow_action.setEnabled(False)
+        self.stop_follow_action.triggered.connect(self.stop_following)
+        file_menu.addAction(self.stop_follow_action)
+
         file_menu.addSeparator()
         exit_action = QAction("Exit", self)
         exit_action.triggered.connect(self.close)
@@ -101,6 +168,21 @@ class MainWindow(QMainWindow):
         file_action.triggered.connect(lambda: self.set_line_type(LineType.FILE_ANNOTATION))
         line_type_menu.addAction(file_action)
 
+        matching_brace_action = QAction("Go to Matching Brace", self)
+        matching_brace_action.setShortcut(QKeySequence("Ctrl+]"))
+        matching_brace_action.triggered.connect(self.editor.go_to_matching_brace)
+        edit_menu.addAction(matching_brace_action)
+
+        next_occurrence_action = QAction("Next Occurrence", self)
+        next_occurrence_action.setShortcut(QKeySequence("F3"))
+        next_occurrence_action.triggered.connect(lambda: self.occurrences.go_to_occurrence(1))
+        edit_menu.addAction(next_occurrence_action)
+
+        previous_occurrence_action = QAction("Previous Occurrence", self)
+        previous_occurrence_action.setShortcut(QKeySequence("Shift+F3"))
+        previous_occurrence_action.triggered.connect(lambda: self.occurrences.go_to_occurrence(-1))
+        edit_menu.addAction(previous_occurrence_action)
+
         # LANGUAGE menu
         language_menu = menubar.addMenu("Language")
 
@@ -112,9 +194,8 @@ class MainWindow(QMainWindow):
             self.language_actions[name] = action
             return action
 
-        make_lang_action("Python", self.use_python_lexer)
-        make_lang_action("C++", self.use_cpp_lexer)
-        make_lang_action("Java", self.use_java_lexer)
+        for name in LANGUAGES:
+            make_lang_action(name, lambda _, name=name: self.use_language(name))
 
         # OPTIONS menu
         options_menu = menubar.addMenu("Options")
@@ -154,6 +235,66 @@ class MainWindow(QMainWindow):
 
         options_menu.addAction(self.editor.copy_action)
 
+        # Sidecar <name>.trace.cache files holding styles and fold levels,
+        # written when a document is saved and used when it is opened again
+        self.snapshot_action = QAction("Cache Styles and Folds", self)
+        self.snapshot_action.setCheckable(True)
+        self.snapshot_action.setChecked(True)
+        options_menu.addAction(self.snapshot_action)
+
+        # VIEW menu
+        view_menu = menubar.addMenu("View")
+        view_menu.addAction(self.outline_pane.toggleViewAction())
+
+        minimap_action = QAction("Minimap", self)
+        minimap_action.setCheckable(True)
+        minimap_action.setChecked(True)
+        minimap_action.toggled.connect(self.minimap.setVisible)
+        view_menu.addAction(minimap_action)
+        view_menu.addSeparator()
+
+        collapse_code_action = QAction("Collapse All Code", self)
+        collapse_code_action.triggered.connect(self.editor.collapse_all_code)
+        view_menu.addAction(collapse_code_action)
+
+        only_notes_action = QAction("Show Only Notes", self)
+        only_notes_action.triggered.connect(self.editor.show_only_notes)
+        view_menu.addAction(only_notes_action)
+
+        expand_all_action = QAction("Expand All", self)
+        expand_all_action.triggered.connect(self.editor.expand_all)
+        view_menu.addAction(expand_all_action)
+
+        view_menu.addSeparator()
+        self.perf_action = QAction("Performance Monitor", self)
+        self.perf_action.setCheckable(True)
+        self.perf_action.triggered.connect(self.perf_pane.set_recording)
+        view_menu.addAction(self.perf_action)
+
+        # PLAYBACK menu
+        playback_menu = menubar.addMenu("Playback")
+        self.playback_action = QAction("Playback Mode", self)
+        self.playback_action.setCheckable(True)
+        self.playback_action.setShortcut(QKeySequence("F5"))
+        self.playback_action.triggered.connect(self.toggle_playback)
+        playback_menu.addAction(self.playback_action)
+        playback_menu.addSeparator()
+
+        self.playback_step_actions = []
+        def make_step_action(text, shortcut, slot):
+            action = QAction(text, self)
+            action.setShortcut(QKeySequence(shortcut))
+            action.setEnabled(False)
+            action.triggered.connect(slot)
+            playback_menu.addAction(action)
+            self.playback_step_actions.append(action)
+
+        make_step_action("Step Forward", "F10", lambda: self.player.step(1))
+        make_step_action("Step Back", "Shift+F10", lambda: self.player.step(-1))
+        make_step_action("Jump Steps…", "Ctrl+F10", self.jump_steps)
+        make_step_action("Next Depth Change", "F11", self.player.next_depth_change)
+        make_step_action("Previous Depth Change", "Shift+F11", self.player.previous_depth_change)
+
         # Keyboard shortcuts for line types
         self.setup_keyboard_shortcuts()
 
@@ -162,9 +303,12 @@ class MainWindow(QMainWindow):
 
         self.init_default_states()
 
+        self.perf_action.setChecked(recorder.enabled)
+        self.perf_pane.set_recording(recorder.enabled)
+
     def init_default_states(self):
         self.set_tab_size(4)
-        self.update_language_checkmarks("Python")
+        self.update_language_checkmarks(DEFAULT_LANGUAGE)
         self.use_dark_theme()  # Default to dark
         self.update_title()
 
@@ -189,32 +333,77 @@ class MainWindow(QMainWindow):
         title = f"Code Trace Editor - {base_name}"
         if self.unsaved_changes:
             title += "*"
+        if self.follower.is_following():
+            title += f" (following {os.path.basename(self.follower.filename)})"
         self.setWindowTitle(title)
 
+    def update_wrap_progress(self, percent):
+        self.wrap_progress.setValue(percent)
+        self.wrap_progress.setVisible(percent < 100)
+
+    def update_occurrence_label(self, name, rows):
+        if not name:
+            self.occurrence_label.clear()
+        elif not self.occurrences.index.complete():
+            self.occurrence_label.setText(f"{name}: indexing...")
+        else:
+            self.occurrence_label.setText(f"{name}: {rows} line{'s' if rows != 1 else ''}")
+
+    def toggle_playback(self):
+        if self.playback_action.isChecked():
+            self.player.start()
+        else:
+            self.player.stop()
+        for action in self.playback_step_actions:
+            action.setEnabled(self.player.active)
+
+    def stop_playback(self):
+        self.playback_action.setChecked(False)
+        self.toggle_playback()
+
+    def jump_steps(self):
+        steps, ok = QInputDialog.getInt(self, "Jump Steps", "Steps (negative to go back):",
+                                        self.playback_jump, -2 ** 31 + 1, 2 ** 31 - 1)
+        if ok:
+            self.playback_jump = steps
+            self.player.step(steps)
+
+    def update_playback_label(self, step, steps, file_label):
+        if step < 0:
+            self.playback_label.clear()
+        elif file_label:
+            self.playback_label.setText(f"Step {step + 1:,} of {steps:,} · {file_label}")
+        else:
+            self.playback_label.setText(f"Step {step + 1:,} of {steps:,}")
+
     # Theme methods
     def use_dark_theme(self):
         self.current_theme = "Dark"
-        self.themes["Dark"].apply(self.python_lexer)
-        self.themes["Dark"].apply(self.cpp_lexer)
-        self.themes["Dark"].apply(self.java_lexer)
+        for lexer in self.lexers.values():
+            self.themes["Dark"].apply(lexer)
         self.themes["Dark"].apply_to_window(self)
+        self.occurrences.set_color(self.themes["Dark"].occurrence_bg)
+        self.player.set_color(self.themes["Dark"].playback_bg)
         self.editor.setLexer(self.editor.lexer())  # Force restyle
         self.editor.setCaretForegroundColor(QColor("#FFFFFF"))  # Set cursor color
         self.editor.setMarginsBackgroundColor(self.themes["Dark"].window_bg)
         self.editor.setMarginsForegroundColor(self.themes["Dark"].window_fg)
+        self.minimap.set_colors(self.themes["Dark"].window_bg, self.themes["Dark"].minimap_viewport)
         self.update_theme_checkmarks("Dark")
         self.mark_unsaved()
 
     def use_light_theme(self):
         self.current_theme = "Light"
-        self.themes["Light"].apply(self.python_lexer)
-        self.themes["Light"].apply(self.cpp_lexer)
-        self.themes["Light"].apply(self.java_lexer)
+        for lexer in self.lexers.values():
+            self.themes["Light"].apply(lexer)
         self.themes["Light"].apply_to_window(self)
+        self.occurrences.set_color(self.themes["Light"].occurrence_bg)
+        self.player.set_color(self.themes["Light"].playback_bg)
         self.editor.setLexer(self.editor.lexer())  # Force restyle
         self.editor.setCaretForegroundColor(QColor("#000000"))  # Set cursor color
         self.editor.setMarginsBackgroundColor(self.themes["Light"].window_bg)
         self.editor.setMarginsForegroundColor(self.themes["Light"].window_fg)
+        self.minimap.set_colors(self.themes["Light"].window_bg, self.themes["Light"].minimap_viewport)
         self.update_theme_checkmarks("Light")
         self.mark_unsaved()
 
@@ -224,38 +413,29 @@ class MainWindow(QMainWindow):
 
     # Word Wrap method
     def toggle_word_wrap(self):
-        if self.word_wrap_action.isChecked():
-            self.editor.setWrapMode(QsciScintilla.WrapWord)
-        else:
-            self.editor.setWrapMode(QsciScintilla.WrapNone)
+        self.editor.set_word_wrap(self.word_wrap_action.isChecked())
         self.mark_unsaved()
 
     # Language methods
-    def use_python_lexer(self):
-        self.editor.setLexer(self.python_lexer)
-        self.themes[self.current_theme].apply(self.python_lexer)
+    def language_lexer(self, name):
+        """
+        This window's lexer for a language name, created on first use.
+        """
+        lexer = self.lexers.get(name)
+        if lexer is None:
+            lexer = self.lexers[name] = lexer_for(name, self.editor)
+        return lexer
+
+    def use_language(self, name):
+        if name not in LANGUAGES:
+            name = DEFAULT_LANGUAGE
+        lexer = self.language_lexer(name)
+        self.editor.setLexer(lexer)
+        self.themes[self.current_theme].apply(lexer)
         self.editor.update_row_data()
         self.editor.apply_folding()
-        self.update_language_checkmarks("Python")
-        self.current_language_name = "Python"
-        self.mark_unsaved()
-
-    def use_cpp_lexer(self):
-        self.editor.setLexer(self.cpp_lexer)
-        self.themes[self.current_theme].apply(self.cpp_lexer)
-        self.editor.update_row_data()
-        self.editor.apply_folding()
-        self.update_language_checkmarks("C++")
-        self.current_language_name = "C++"
-        self.mark_unsaved()
-
-    def use_java_lexer(self):
-        self.editor.setLexer(self.java_lexer)
-        self.themes[self.current_theme].apply(self.java_lexer)
-        self.editor.update_row_data()
-        self.editor.apply_folding()
-        self.update_language_checkmarks("Java")
-        self.current_language_name = "Java"
+        self.update_language_checkmarks(name)
+        self.current_language_name = name
         self.mark_unsaved()
 
     def update_language_checkmarks(self, selected_lang):
@@ -275,17 +455,23 @@ class MainWindow(QMainWindow):
         for size, action in self.tabsize_actions.items():
             action.setChecked(size == selected_size)
 
-    def new_file(self):
-        if not self.check_save_if_needed():
-            return
+    def clear_document(self):
+        self.stop_following()
+        self.stop_playback()
         self.editor.clear()
         self.editor.row_data.clear()
         self.editor.init_row_data()
         self.current_filename = "untitled.trace"
-        self.current_language_name = "Python"
-        self.editor.setLexer(self.python_lexer)
-        self.themes[self.current_theme].apply(self.python_lexer)
-        self.update_language_checkmarks("Python")
+
+    def new_file(self):
+        if not self.check_save_if_needed():
+            return
+        self.clear_document()
+        self.current_language_name = DEFAULT_LANGUAGE
+        lexer = self.language_lexer(DEFAULT_LANGUAGE)
+        self.editor.setLexer(lexer)
+        self.themes[self.current_theme].apply(lexer)
+        self.update_language_checkmarks(DEFAULT_LANGUAGE)
         self.set_tab_size(4)
         self.word_wrap_action.setChecked(False)
         self.toggle_word_wrap()
@@ -294,7 +480,7 @@ class MainWindow(QMainWindow):
     def open_file(self):
         if not self.check_save_if_needed():
             return
-        dialog = QFileDialog(self, "Open File", ".", "Trace Files (*.trace);;All Files (*)")
+        dialog = QFileDialog(self, "Open File", ".", TRACE_FILTERS)
         if dialog.exec_() != QFileDialog.Accepted:
             return
         filename = dialog.selectedFiles()[0]
@@ -302,6 +488,79 @@ class MainWindow(QMainWindow):
             return
         self.load_trace_file(filename)
 
+    def open_archive_rows(self):
+        """
+        Open a range of rows of a .tracez archive, unpacking only the chunks
+        that hold them. The rows open as a new, unsaved document.
+        """
+        if not self.check_save_if_needed():
+            return
+        dialog = QFileDialog(self, "Open Archive Rows", ".", "Trace Archives (*.tracez);;All Files (*)")
+        if dialog.exec_() != QFileDialog.Accepted:
+            return
+        filename = dialog.selectedFiles()[0]
+        try:
+            archive = TraceArchive(filename)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Open Archive Rows", str(e))
+            return
+        first, ok = QInputDialog.getInt(self, "Open Archive Rows",
+                                        f"First row (of {archive.line_count:,}):", 1, 1, archive.line_count)
+        if not ok:
+            return
+        count, ok = QInputDialog.getInt(self, "Open Archive Rows", "Number of rows:",
+                                        min(ARCHIVE_ROWS, archive.line_count - first + 1),
+                                        1, archive.line_count - first + 1)
+        if not ok:
+            return
+        self.load_trace_data(archive.trace_data(first - 1, first - 1 + count))
+
+    def export_file(self):
+        dialog = QFileDialog(self, "Export", ".", "HTML Files (*.html);;Markdown Files (*.md)")
+        dialog.setAcceptMode(QFileDialog.AcceptSave)
+        dialog.selectFile(os.path.splitext(os.path.basename(self.current_filename))[0] + ".html")
+        if dialog.exec_() != QFileDialog.Accepted:
+            return
+        filename = dialog.selectedFiles()[0]
+        fmt = "md" if dialog.selectedNameFilter().startswith("Markdown") else "html"
+        if not filename.lower().endswith("." + fmt):
+            filename += "." + fmt
+        export_trace(EditorRows(self.editor), filename, self.editor.lexer(),
+                     self.themes[self.current_theme], fmt,
+                     os.path.basename(self.current_filename), self.editor.spaces_per_tab)
+
+    def compare_with_file(self):
+        dialog = QFileDialog(self, "Compare With", ".", TRACE_FILTERS)
+        if dialog.exec_() != QFileDialog.Accepted:
+            return
+        filename = dialog.selectedFiles()[0]
+        if not os.path.exists(filename):
+            return
+        left = DiffSide.from_editor(os.path.basename(self.current_filename), self.editor,
+                                    self.current_language_name)
+        compare_traces(left, side_from_file(filename), self.current_theme, self)
+
+    def follow_file(self):
+        if not self.check_save_if_needed():
+            return
+        dialog = QFileDialog(self, "Follow File", ".", "Trace Streams (*.jsonl *.log);;All Files (*)")
+        if dialog.exec_() != QFileDialog.Accepted:
+            return
+        filename = dialog.selectedFiles()[0]
+        if not os.path.exists(filename):
+            return
+        self.clear_document()
+        self.follower.start(filename)
+        self.stop_follow_action.setEnabled(True)
+        self.mark_saved()
+
+    def stop_following(self):
+        if not self.follower.is_following():
+            return
+        self.follower.stop()
+        self.stop_follow_action.setEnabled(False)
+        self.update_title()
+
     def save_file(self):
         if self.current_filename == "untitled.trace" and not os.path.exists(self.current_filename):
             self.save_file_as()
@@ -309,17 +568,19 @@ class MainWindow(QMainWindow):
             self.do_save(self.current_filename)
 
     def save_file_as(self):
-        dialog = QFileDialog(self, "Save File As", ".", "Trace Files (*.trace);;All Files (*)")
+        dialog = QFileDialog(self, "Save File As", ".",
+                             "Trace Files (*.trace);;Trace Archives (*.tracez);;All Files (*)")
         dialog.setAcceptMode(QFileDialog.AcceptSave)
         dialog.selectFile(os.path.basename(self.current_filename))
 
         if dialog.exec_() != QFileDialog.Accepted:
             return
         filename = dialog.selectedFiles()[0]
-        if not filename.lower().endswith(".trace"):
-            filename += ".trace"
+        if not filename.lower().endswith((".trace", ".tracez")):
+            filename += ".tracez" if dialog.selectedNameFilter().startswith("Trace Archives") else ".trace"
         self.do_save(filename)
 
+    @timed()
     def do_save(self, filename):
         data = {}
         data["tab_size"] = self.editor.spaces_per_tab
@@ -328,33 +589,68 @@ class MainWindow(QMainWindow):
         data["word_wrap"] = self.word_wrap_action.isChecked()
 
         row_data_list = []
-        for rd in self.editor.row_data:
+        for rd, tabs in zip(self.editor.row_data, self.editor.tabs):
             row_data_list.append({
-                "tabs": rd.tabs,
+                "tabs": tabs,
                 "line_type": rd.line_type.value
             })
         data["row_data"] = row_data_list
 
         data["text"] = self.editor.text()
 
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        if filename.lower().endswith(".tracez"):
+            write_archive(filename, data)
+        else:
+            with open(filename, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+        if self.snapshot_action.isChecked():
+            self.save_snapshot(filename, data["text"])
 
         self.current_filename = filename
         self.mark_saved()
 
-    def load_trace_file(self, filename):
-        with open(filename, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    def current_snapshot_key(self, text):
+        line_types = bytes(rd.line_type.value for rd in self.editor.row_data)
+        return snapshot_key(text, line_types, self.editor.lexer(), self.editor.spaces_per_tab)
+
+    @timed()
+    def save_snapshot(self, filename, text):
+        levels = self.editor.fold_levels
+        if len(levels) != self.editor.lines() or None in levels:
+            return
+        write_snapshot(filename, self.current_snapshot_key(text), self.editor.style_bytes(), levels)
 
+    @timed()
+    def load_trace_file(self, filename):
+        self.load_trace_data(read_trace_data(filename), filename)
+
+    def load_trace_data(self, data, filename=None):
+        """
+        Show a document dict as a .trace file holds it. Without a filename
+        it becomes an untitled document and no snapshot is used.
+        """
+        self.stop_following()
+        self.stop_playback()
         text = data.get("text", "")
         row_data_list = data.get("row_data", [])
         tab_size = data.get("tab_size", 4)
-        language = data.get("language", "Python")
+        language = data.get("language", DEFAULT_LANGUAGE)
         theme = data.get("theme", "Dark")
         word_wrap = data.get("word_wrap", False)
 
         self.editor.clear()
+
+        # Settings first, while the document is empty: setLexer() restyles
+        # the whole document
+        self.set_tab_size(tab_size)
+        self.use_language(language)
+
+        if theme == "Dark":
+            self.use_dark_theme()
+        else:
+            self.use_light_theme()
+
+        # Emptied so setText() does not splice in rows that init_row_data() replaces
         self.editor.row_data.clear()
         self.editor.setText(text)
         self.editor.update()
@@ -363,28 +659,25 @@ class MainWindow(QMainWindow):
         line_count = self.editor.lines()
         for i, rd_dict in enumerate(row_data_list):
             if i < line_count:
-                self.editor.row_data[i].tabs = rd_dict.get("tabs", 0)
                 self.editor.row_data[i].line_type = LineType(rd_dict.get("line_type", 0))
 
-        self.set_tab_size(tab_size)
-        if language == "Python":
-            self.use_python_lexer()
-        elif language == "C++":
-            self.use_cpp_lexer()
-        elif language == "Java":
-            self.use_java_lexer()
+        # A snapshot saved for exactly this content, lexer and tab size
+        # replaces tokenizing and folding the whole document. Snapshots are
+        # only written by do_save(), never for a file that is just opened
+        snapshot = None
+        if filename is not None and self.snapshot_action.isChecked():
+            snapshot = read_snapshot(filename, self.current_snapshot_key(text))
+        if snapshot is not None and self.editor.restore_snapshot(*snapshot):
+            self.editor.update_tabs()
+            self.editor.flush_row_deltas()
         else:
-            self.use_python_lexer()
-
-        if theme == "Dark":
-            self.use_dark_theme()
-        else:
-            self.use_light_theme()
+            self.editor.update_row_data()
+            self.editor.apply_folding()
 
         self.word_wrap_action.setChecked(word_wrap)
         self.toggle_word_wrap()
 
-        self.current_filename = filename
+        self.current_filename = filename or "untitled.trace"
         self.mark_saved()
 
     def check_save_if_needed(self):
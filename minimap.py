@@ -0,0 +1,276 @@
+# minimap.py
+
+from math import ceil
+from PyQt5.QtWidgets import QWidget
+from PyQt5.Qsci import QsciScintilla
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QColor, QImage, QPainter
+from core_lexer import BaseLexer, LineType
+from row_cache import RowCache
+
+UNKNOWN = 0xFF  # row not summarized yet
+
+CODE_STYLES = (
+    BaseLexer.CODE_KEYWORD_STYLE, BaseLexer.CODE_STRING_STYLE, BaseLexer.CODE_NUMBER_STYLE,
+    BaseLexer.CODE_COMMENT_STYLE, BaseLexer.CODE_CONTROL_STYLE, BaseLexer.CODE_DEFCLASS_STYLE,
+    BaseLexer.CODE_BUILTIN_STYLE, BaseLexer.CODE_BOOL_STYLE, BaseLexer.CODE_IMPORT_STYLE,
+)
+
+class MinimapSummary(RowCache):
+    """
+    One style byte per row: TEXT_NOTE_STYLE and FILE_ANNOTATION_STYLE for
+    those rows, and for a CODE row the style covering most of it besides
+    the default one. Rows not summarized yet hold UNKNOWN.
+
+    Each pixel row of the minimap is a bucket of lines_per_bucket rows,
+    summarized from its slice of the bytes. Buckets whose rows changed are
+    collected in `dirty` for the minimap to redraw.
+    """
+    MISSING = UNKNOWN
+    # Pixels per row when the document is shorter than the minimap
+    MAX_ROW_PIXELS = 3
+
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.height = 1
+        self.lines_per_bucket = 1
+        self.bucket_height = 1
+        self.dirty = set()
+
+    @property
+    def styles(self):
+        return self.values
+
+    def missing_values(self, count):
+        return bytearray([UNKNOWN]) * count
+
+    def row_value(self, line):
+        rd = self.editor.row_data[line]
+        if rd.line_type is LineType.TEXT:
+            return BaseLexer.TEXT_NOTE_STYLE
+        if rd.line_type is LineType.FILE_ANNOTATION:
+            return BaseLexer.FILE_ANNOTATION_STYLE
+        widths = {}
+        for start, end, style in self.lexer.code_runs(self.editor.text(line)):
+            if style != BaseLexer.CODE_DEFAULT_STYLE:
+                widths[style] = widths.get(style, 0) + end - start
+        return max(widths, key=widths.get) if widths else BaseLexer.CODE_DEFAULT_STYLE
+
+    def rebuild(self):
+        super().rebuild()
+        self.layout()
+
+    def bucket_size(self, rows):
+        """
+        (lines per bucket, bucket height) fitting `rows` rows into the minimap.
+        """
+        rows = max(rows, 1)
+        lines_per_bucket = max(1, ceil(rows / self.height))
+        if lines_per_bucket == 1:
+            return 1, max(1, min(self.MAX_ROW_PIXELS, self.height // rows))
+        return lines_per_bucket, 1
+
+    def layout(self):
+        """
+        Fit the buckets to the document length and the minimap height;
+        every pixel row is dirty afterwards, past the last bucket too.
+        """
+        self.lines_per_bucket, self.bucket_height = self.bucket_size(len(self.styles))
+        self.dirty = set(range(max(self.bucket_count(), ceil(self.height / self.bucket_height))))
+
+    def set_height(self, height):
+        self.height = max(height, 1)
+        self.layout()
+
+    def bucket_count(self):
+        return ceil(len(self.styles) / self.lines_per_bucket)
+
+    def bucket_of(self, line):
+        return line // self.lines_per_bucket
+
+    def mark_dirty(self, first_line, end_line):
+        if end_line > first_line:
+            self.dirty.update(range(self.bucket_of(first_line), self.bucket_of(end_line - 1) + 1))
+
+    def rows_replaced(self, start, old_values, new_values):
+        removed = len(old_values)
+        added = len(new_values)
+        if added == removed:
+            self.mark_dirty(start, start + added)
+        elif self.bucket_size(len(self.styles)) != (self.lines_per_bucket, self.bucket_height):
+            self.layout()
+        else:
+            # Every later row moved: redraw down to the old or new end
+            old_buckets = ceil((len(self.styles) - added + removed) / self.lines_per_bucket)
+            self.mark_dirty(start, len(self.styles))
+            self.dirty.update(range(self.bucket_count(), old_buckets))
+
+    def rows_filled(self, first_line, end_line):
+        self.mark_dirty(first_line, end_line)
+
+    def bucket_styles(self, bucket):
+        """
+        (line type style, code style) of a bucket, each None if it has no
+        such rows summarized: the annotation or note style if any of its rows
+        has one, and the most common non-default code style.
+        """
+        start = bucket * self.lines_per_bucket
+        rows = self.styles[start:start + self.lines_per_bucket]
+        if BaseLexer.FILE_ANNOTATION_STYLE in rows:
+            type_style = BaseLexer.FILE_ANNOTATION_STYLE
+        elif BaseLexer.TEXT_NOTE_STYLE in rows:
+            type_style = BaseLexer.TEXT_NOTE_STYLE
+        else:
+            type_style = None
+        count, code_style = max((rows.count(style), style) for style in CODE_STYLES)
+        if not count:
+            code_style = BaseLexer.CODE_DEFAULT_STYLE if BaseLexer.CODE_DEFAULT_STYLE in rows else None
+        return type_style, code_style
+
+
+class Minimap(QWidget):
+    """
+    Overview strip beside the editor: a column of line types and one of the
+    dominant code styles, with the part on screen outlined. Drawn into a
+    cached image where buckets change, so a repaint only copies the image;
+    clicking or dragging scrolls the editor there.
+    """
+    WIDTH = 48
+    TYPE_WIDTH = 8
+    SUMMARY_SLICE_MS = 8
+
+    def __init__(self, editor, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.summary = MinimapSummary(editor)
+        self.image = QImage()
+        self.background = QColor("#000000")
+        self.viewport_color = QColor(255, 255, 255, 48)
+        self.setFixedWidth(self.WIDTH)
+
+        self.summary_timer = QTimer(self)
+        self.summary_timer.setInterval(0)
+        self.summary_timer.timeout.connect(self.summarize_more)
+
+        # Row deltas arrive in bursts (a followed file appends many batches
+        # per event-loop turn); the image is redrawn once after the burst
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.setSingleShot(True)
+        self.redraw_timer.setInterval(0)
+        self.redraw_timer.timeout.connect(self.redraw)
+
+        editor.rowsChanged.connect(self.on_rows_changed)
+        editor.SCN_UPDATEUI.connect(self.on_update_ui)
+
+    def set_colors(self, background, viewport):
+        self.background = QColor(background)
+        self.viewport_color = QColor(viewport)
+        self.summary.layout()
+        self.redraw()
+
+    def sync(self):
+        if self.summary.sync():
+            self.summary_timer.start()
+
+    def on_rows_changed(self, start, removed, added):
+        self.summary.apply_delta(start, removed, added)
+        self.sync()
+        self.redraw_timer.start()
+
+    def summarize_more(self):
+        if self.summary.fill_slice(self.SUMMARY_SLICE_MS):
+            self.summary_timer.stop()
+        self.redraw()
+
+    def on_update_ui(self, updated):
+        if not self.summary.in_sync():
+            self.sync()
+            self.redraw()
+        elif updated & QsciScintilla.SC_UPDATE_V_SCROLL:
+            self.update()
+
+    def resizeEvent(self, event):
+        self.image = QImage(self.size(), QImage.Format_RGB32)
+        self.image.fill(self.background)
+        self.summary.set_height(self.height())
+        self.sync()
+        self.redraw()
+        super().resizeEvent(event)
+
+    def style_color(self, style):
+        lexer = self.editor.lexer()
+        color = lexer.color(style) if lexer else QColor("#808080")
+        if style == BaseLexer.CODE_DEFAULT_STYLE:
+            # Plain code stays in the background next to highlighted rows
+            background = self.background
+            color = QColor((color.red() + 2 * background.red()) // 3,
+                           (color.green() + 2 * background.green()) // 3,
+                           (color.blue() + 2 * background.blue()) // 3)
+        return color
+
+    def redraw(self):
+        """
+        Paint the dirty buckets into the cached image.
+        """
+        summary = self.summary
+        if not summary.dirty or self.image.isNull():
+            return
+        colors = {}
+        def color_of(style):
+            if style is None:
+                return self.background
+            if style not in colors:
+                colors[style] = self.style_color(style)
+            return colors[style]
+
+        bucket_height = summary.bucket_height
+        code_width = self.width() - self.TYPE_WIDTH
+        bucket_count = summary.bucket_count()
+        painter = QPainter(self.image)
+        for bucket in summary.dirty:
+            y = bucket * bucket_height
+            if y >= self.image.height():
+                continue
+            if bucket < bucket_count:
+                type_style, code_style = summary.bucket_styles(bucket)
+            else:
+                type_style = code_style = None
+            painter.fillRect(0, y, self.TYPE_WIDTH, bucket_height,
+                             color_of(type_style if type_style is not None else code_style))
+            painter.fillRect(self.TYPE_WIDTH, y, code_width, bucket_height, color_of(code_style))
+        painter.end()
+        summary.dirty = set()
+        self.update()
+
+    def visible_rows(self):
+        editor = self.editor
+        first_display = editor.SendScintilla(QsciScintilla.SCI_GETFIRSTVISIBLELINE)
+        on_screen = editor.SendScintilla(QsciScintilla.SCI_LINESONSCREEN)
+        first = editor.SendScintilla(QsciScintilla.SCI_DOCLINEFROMVISIBLE, first_display)
+        last = editor.SendScintilla(QsciScintilla.SCI_DOCLINEFROMVISIBLE, first_display + on_screen)
+        return first, max(last, first + 1)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.drawImage(event.rect(), self.image, event.rect())
+        summary = self.summary
+        first, last = self.visible_rows()
+        top = summary.bucket_of(first) * summary.bucket_height
+        bottom = (summary.bucket_of(last) + 1) * summary.bucket_height
+        painter.fillRect(0, top, self.width(), max(bottom - top, 2), self.viewport_color)
+        painter.end()
+
+    def scroll_to(self, y):
+        summary = self.summary
+        line = (max(y, 0) // summary.bucket_height) * summary.lines_per_bucket
+        line = min(line, self.editor.lines() - 1)
+        editor = self.editor
+        on_screen = editor.SendScintilla(QsciScintilla.SCI_LINESONSCREEN)
+        display_line = editor.SendScintilla(QsciScintilla.SCI_VISIBLEFROMDOCLINE, line)
+        editor.setFirstVisibleLine(max(display_line - on_screen // 2, 0))
+
+    def mousePressEvent(self, event):
+        self.scroll_to(event.pos().y())
+
+    def mouseMoveEvent(self, event):
+        self.scroll_to(event.pos().y())
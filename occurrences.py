@@ -0,0 +1,251 @@
+# occurrences.py
+
+import sys
+from bisect import bisect_left, bisect_right
+from PyQt5.Qsci import QsciScintilla
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from core_lexer import LineType
+from row_cache import RowCache
+
+class OccurrenceIndex(RowCache):
+    """
+    Identifier names of every CODE row, and how many rows use each name.
+    Names are interned and rows with the same names share one tuple, so
+    most rows cost a single list slot.
+    """
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.row_counts = {}   # name -> number of rows using it
+        self.name_tuples = {}  # every distinct row tuple, shared between rows
+        self.tuple_rows = {}   # row tuple -> number of rows holding it
+        self.line_cache = {}   # name -> its lines, until the next delta
+
+    @property
+    def row_names(self):
+        return self.values
+
+    def names_of(self, line):
+        rd = self.editor.row_data[line]
+        if rd.line_type != LineType.CODE:
+            return ()
+        names = {name for _, _, name in self.lexer.code_identifiers(self.editor.text(line))}
+        if not names:
+            return ()
+        names = tuple(sorted(map(sys.intern, names)))
+        return self.name_tuples.setdefault(names, names)
+
+    def count(self, names, step):
+        """
+        Count a row holding `names` in (step 1) or out (step -1). A tuple
+        no row holds any more leaves name_tuples.
+        """
+        rows = self.tuple_rows.get(names, 0) + step
+        if rows:
+            self.tuple_rows[names] = rows
+        else:
+            del self.tuple_rows[names]
+            del self.name_tuples[names]
+        counts = self.row_counts
+        for name in names:
+            total = counts.get(name, 0) + step
+            if total:
+                counts[name] = total
+            else:
+                del counts[name]
+
+    def row_value(self, line):
+        # Counted as read; rows_replaced() uncounts the rows dropped
+        names = self.names_of(line)
+        if names:
+            self.count(names, 1)
+        return names
+
+    def rebuild(self):
+        super().rebuild()
+        self.row_counts = {}
+        self.name_tuples = {}
+        self.tuple_rows = {}
+        self.line_cache = {}
+
+    def rows_replaced(self, start, old_values, new_values):
+        for names in old_values:
+            if names:
+                self.count(names, -1)
+        self.line_cache = {}
+
+    def rows_filled(self, first_line, end_line):
+        self.line_cache = {}
+
+    def rows_using(self, name):
+        return self.row_counts.get(name, 0)
+
+    def lines(self, name):
+        """
+        Sorted lines of the indexed rows using `name`, found in one pass and
+        kept until the next delta: storing lines per name would mean shifting
+        every later one on each inserted row.
+        """
+        lines = self.line_cache.get(name)
+        if lines is None:
+            lines = self.line_cache[name] = [line for line, names in enumerate(self.row_names)
+                                             if names and name in names]
+        return lines
+
+
+class OccurrenceHighlighter(QObject):
+    """
+    Marks every occurrence of the identifier at the cursor with an indicator.
+    Only the lines on screen are marked; scrolling marks the new ones.
+    """
+    # Name at the cursor ("" for none) and the number of rows using it
+    occurrencesChanged = pyqtSignal(str, int)
+
+    INDICATOR = QsciScintilla.INDIC_CONTAINER
+    INDEX_SLICE_MS = 8
+
+    def __init__(self, editor, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.index = OccurrenceIndex(editor)
+        self.name = ""
+        self.rows = 0
+        self.marked = None  # (name, first line, last line) last marked
+
+        editor.SendScintilla(QsciScintilla.SCI_INDICSETSTYLE, self.INDICATOR, QsciScintilla.INDIC_ROUNDBOX)
+        editor.SendScintilla(QsciScintilla.SCI_INDICSETALPHA, self.INDICATOR, 120)
+        editor.SendScintilla(QsciScintilla.SCI_INDICSETUNDER, self.INDICATOR, True)
+
+        self.index_timer = QTimer(self)
+        self.index_timer.setInterval(0)
+        self.index_timer.timeout.connect(self.index_more)
+
+        editor.rowsChanged.connect(self.on_rows_changed)
+        editor.lexerChanged.connect(self.on_lexer_changed)
+        editor.cursorPositionChanged.connect(self.on_cursor_moved)
+        editor.SCN_UPDATEUI.connect(self.on_update_ui)
+
+    def set_color(self, color):
+        self.editor.SendScintilla(QsciScintilla.SCI_INDICSETFORE, self.INDICATOR, color)
+
+    def sync(self):
+        if self.index.sync():
+            self.index_timer.start()
+
+    def on_rows_changed(self, start, removed, added):
+        self.index.apply_delta(start, removed, added)
+        self.sync()
+        self.marked = None
+        self.on_cursor_moved()
+
+    def on_lexer_changed(self):
+        # Every row's names depend on the lexer; no row delta says so
+        self.index.rebuild()
+        self.marked = None
+        self.rows = -1
+        self.on_cursor_moved()
+
+    def index_more(self):
+        if self.index.fill_slice(self.INDEX_SLICE_MS):
+            self.index_timer.stop()
+            self.rows = -1
+            self.report()
+
+    def report(self):
+        rows = self.index.rows_using(self.name)
+        if rows != self.rows:
+            self.rows = rows
+            self.occurrencesChanged.emit(self.name, rows)
+
+    def identifier_at(self, line, index):
+        """
+        (start, end, name) of the identifier token at or just before `index`.
+        """
+        editor = self.editor
+        if line >= len(editor.row_data) or editor.row_data[line].line_type != LineType.CODE:
+            return None
+        lexer = editor.lexer()
+        if lexer is None:
+            return None
+        for token in lexer.code_identifiers(editor.text(line)):
+            if token[0] <= index <= token[1]:
+                return token
+        return None
+
+    def on_cursor_moved(self, *_):
+        self.sync()
+        token = self.identifier_at(*self.editor.getCursorPosition())
+        name = token[2] if token else ""
+        if name != self.name:
+            self.name = name
+            self.rows = -1
+        self.report()
+        self.mark_visible()
+
+    def on_update_ui(self, updated):
+        if updated & (QsciScintilla.SC_UPDATE_V_SCROLL | QsciScintilla.SC_UPDATE_CONTENT):
+            self.mark_visible()
+
+    def visible_lines(self):
+        editor = self.editor
+        first_display = editor.SendScintilla(QsciScintilla.SCI_GETFIRSTVISIBLELINE)
+        on_screen = editor.SendScintilla(QsciScintilla.SCI_LINESONSCREEN)
+        first = editor.SendScintilla(QsciScintilla.SCI_DOCLINEFROMVISIBLE, first_display)
+        last = editor.SendScintilla(QsciScintilla.SCI_DOCLINEFROMVISIBLE, first_display + on_screen)
+        return first, min(last, editor.lines() - 1)
+
+    def mark_visible(self):
+        """
+        Put the indicator on the occurrences of the current name in the
+        lines on screen, replacing the previous marks. Nothing is redone
+        while the name and the lines on screen stay the same.
+        """
+        editor = self.editor
+        first, last = self.visible_lines()
+        if self.marked == (self.name, first, last):
+            return
+        editor.SendScintilla(QsciScintilla.SCI_SETINDICATORCURRENT, self.INDICATOR)
+        # Cheap however long the document: only the lines on screen carry marks
+        editor.SendScintilla(QsciScintilla.SCI_INDICATORCLEARRANGE, 0, editor.length())
+        self.marked = (self.name, first, last)
+        if not self.name:
+            return
+
+        index = self.index
+        lexer = editor.lexer()
+        in_sync = index.in_sync()
+        for line in range(first, last + 1):
+            if editor.row_data[line].line_type != LineType.CODE:
+                continue
+            if not editor.SendScintilla(QsciScintilla.SCI_GETLINEVISIBLE, line):
+                continue
+            names = index.row_names[line] if in_sync else None
+            if names is not None and self.name not in names:
+                continue
+            for token_start, token_end, name in lexer.code_identifiers(editor.text(line)):
+                if name == self.name:
+                    position = editor.positionFromLineIndex(line, token_start)
+                    length = editor.positionFromLineIndex(line, token_end) - position
+                    editor.SendScintilla(QsciScintilla.SCI_INDICATORFILLRANGE, position, length)
+
+    def go_to_occurrence(self, step):
+        """
+        Move the cursor to the next (step 1) or previous (step -1) line
+        using the current name, wrapping around the document.
+        """
+        if not self.name:
+            return
+        lines = self.index.lines(self.name)
+        if not lines:
+            return
+        line = self.editor.getCursorPosition()[0]
+        if step > 0:
+            i = bisect_right(lines, line)
+            target = lines[i] if i < len(lines) else lines[0]
+        else:
+            i = bisect_left(lines, line)
+            target = lines[i - 1] if i > 0 else lines[-1]
+        for start, _, name in self.editor.lexer().code_identifiers(self.editor.text(target)):
+            if name == self.name:
+                self.editor.setCursorPosition(target, start)
+                self.editor.ensureLineVisible(target)
+                return
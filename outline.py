@@ -0,0 +1,194 @@
+# outline.py
+
+import re
+from bisect import bisect_left
+from itertools import islice
+from operator import attrgetter
+from PyQt5.QtWidgets import QDockWidget, QListWidget, QListWidgetItem
+from PyQt5.Qsci import QsciScintilla
+from PyQt5.QtCore import Qt, QTimer
+from core_lexer import LineType
+
+# In a map of one byte per row, 0 for rows at zero fold depth: a row at
+# zero depth followed by a deeper one
+HEADER_CANDIDATE = re.compile(rb"\x00(?=\x01)")
+
+class OutlineEntry:
+    FILE = 0
+    HEADER = 1
+
+    def __init__(self, line, kind, label):
+        self.line = line
+        self.kind = kind
+        self.label = label
+
+    def same_as(self, other):
+        return self.kind == other.kind and self.label == other.label
+
+
+class OutlineIndex:
+    """
+    Sorted outline entries (FILE_ANNOTATION lines and top-level fold headers)
+    kept in step with the editor's rowsChanged deltas, so an edit only
+    re-reads the rows it touched.
+    """
+    def __init__(self, editor):
+        self.editor = editor
+        self.entries = []
+        self.lines = []  # entry line numbers, parallel to entries, for bisect
+
+    def entries_between(self, first_line, end_line, file_lines=None):
+        """
+        Outline entries of rows first_line .. end_line - 1. Candidate lines
+        are found in bulk from the row types and fold depths, so only they
+        have their text read. file_lines, if given, are the FILE_ANNOTATION
+        rows among them, when the row types are known not to have changed.
+        """
+        editor = self.editor
+        row_data = editor.row_data
+        FILE_ANNOTATION = LineType.FILE_ANNOTATION
+        if file_lines is None:
+            file_lines = [line for line, rd in enumerate(islice(row_data, first_line, end_line), first_line)
+                          if rd.line_type is FILE_ANNOTATION]
+        kinds = dict.fromkeys(file_lines, OutlineEntry.FILE)
+        # Header rule of SemanticEditor.apply_folding at depth zero, by the
+        # same depths: a CODE row followed by a deeper row inside its region
+        if editor.brace_folding():
+            depths = map(attrgetter("fold_depth"), islice(row_data, first_line, end_line + 1))
+        else:
+            depths = editor.tabs[first_line:end_line + 1]
+        indented = bytes(map(bool, depths))
+        CODE = LineType.CODE
+        for match in HEADER_CANDIDATE.finditer(indented):
+            line = first_line + match.start()
+            if row_data[line].line_type is CODE and row_data[line + 1].line_type is not FILE_ANNOTATION:
+                kinds[line] = OutlineEntry.HEADER
+        entries = []
+        for line in sorted(kinds):
+            text = editor.text(line).strip()
+            if text:
+                entries.append(OutlineEntry(line, kinds[line], text))
+        return entries
+
+    def rebuild(self):
+        self.entries = self.entries_between(0, len(self.editor.row_data))
+        self.lines = [e.line for e in self.entries]
+
+    def apply_delta(self, start, removed, added, depths_only=False):
+        """
+        Rows [start, start + removed) were replaced by `added` rows, or with
+        depths_only (removed == added), only the fold depths of those rows
+        changed. Returns
+        (first, old_count, new_entries) describing the replaced entry slice,
+        less the unchanged entries at either end, or None when the outline
+        did not change.
+        """
+        # The row before `start` may gain or lose header status from its new successor
+        first_line = max(start - 1, 0)
+        first = bisect_left(self.lines, first_line)
+        last = bisect_left(self.lines, start + removed)
+
+        shift = added - removed
+        if shift:
+            for entry in self.entries[last:]:
+                entry.line += shift
+            self.lines[last:] = [line + shift for line in self.lines[last:]]
+
+        end_line = min(start + added, len(self.editor.row_data))
+        old_entries = self.entries[first:last]
+        file_lines = None
+        if depths_only:
+            file_lines = [e.line for e in old_entries if e.kind == OutlineEntry.FILE]
+        new_entries = self.entries_between(first_line, end_line, file_lines)
+        self.entries[first:last] = new_entries
+        self.lines[first:last] = [e.line for e in new_entries]
+
+        common = min(len(old_entries), len(new_entries))
+        head = 0
+        while head < common and old_entries[head].same_as(new_entries[head]):
+            head += 1
+        if head == len(old_entries) == len(new_entries):
+            return None
+        tail = 0
+        while tail < common - head and old_entries[-1 - tail].same_as(new_entries[-1 - tail]):
+            tail += 1
+        return first + head, len(old_entries) - head - tail, new_entries[head:len(new_entries) - tail]
+
+
+class OutlinePane(QDockWidget):
+    def __init__(self, editor, parent=None):
+        super().__init__("Outline", parent)
+        self.setObjectName("OutlinePane")
+        self.editor = editor
+        self.index = OutlineIndex(editor)
+
+        self.list_widget = QListWidget(self)
+        # Bold file rows are as tall as header rows; without this the view
+        # measures every item whenever rows are inserted
+        self.list_widget.setUniformItemSizes(True)
+        self.list_widget.itemActivated.connect(self.jump_to_item)
+        self.list_widget.itemClicked.connect(self.jump_to_item)
+        self.setWidget(self.list_widget)
+
+        self.editor.rowsChanged.connect(self.on_rows_changed)
+        self.editor.tabsChanged.connect(self.on_tabs_changed)
+        self.editor.depthsChanged.connect(self.on_depths_changed)
+        # Deferred: a new lexer's brace depths are worked out after setLexer() returns
+        self.editor.lexerChanged.connect(lambda: QTimer.singleShot(0, self.on_lexer_changed))
+        self.reset()
+
+    def make_item(self, entry):
+        if entry.kind == OutlineEntry.FILE:
+            item = QListWidgetItem(entry.label)
+            font = item.font()
+            font.setBold(True)
+            item.setFont(font)
+        else:
+            item = QListWidgetItem("    " + entry.label)
+        return item
+
+    def reset(self):
+        self.index.rebuild()
+        self.list_widget.clear()
+        for entry in self.index.entries:
+            self.list_widget.addItem(self.make_item(entry))
+
+    def on_rows_changed(self, start, removed, added):
+        self.show_change(self.index.apply_delta(start, removed, added))
+
+    def on_tabs_changed(self, start, end):
+        # Tabs are the fold depths only without brace folding
+        if not self.editor.brace_folding():
+            self.on_depths_changed(start, end)
+
+    def on_depths_changed(self, start, end):
+        # Header rows are found by their depths; file rows stay as they are
+        self.show_change(self.index.apply_delta(start, end - start, end - start, depths_only=True))
+
+    def on_lexer_changed(self):
+        # Brace folding may have been switched on or off
+        self.reset()
+
+    def show_change(self, change):
+        if change is None:
+            return
+        first, old_count, new_entries = change
+        if first == 0 and old_count == self.list_widget.count():
+            # Whole outline replaced (open/new file, tab size or language switch)
+            self.list_widget.clear()
+            old_count = 0
+        for _ in range(old_count):
+            self.list_widget.takeItem(first)
+        for offset, entry in enumerate(new_entries):
+            self.list_widget.insertItem(first + offset, self.make_item(entry))
+
+    def jump_to_item(self, item):
+        row = self.list_widget.row(item)
+        if not 0 <= row < len(self.index.entries):
+            return
+        line = self.index.entries[row].line
+        self.editor.ensureLineVisible(line)
+        self.editor.setCursorPosition(line, 0)
+        display_line = self.editor.SendScintilla(QsciScintilla.SCI_VISIBLEFROMDOCLINE, line)
+        self.editor.setFirstVisibleLine(display_line)
+        self.editor.setFocus(Qt.OtherFocusReason)
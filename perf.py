@@ -0,0 +1,193 @@
+# perf.py
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from PyQt5.QtWidgets import (
+    QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog
+)
+from PyQt5.QtCore import QTimer
+
+HISTOGRAM_BARS = " ▁▂▃▄▅▆▇█"
+
+class PerfRecorder:
+    """
+    Opt-in timing of the editor's hot paths. Each instrumented function keeps
+    a rolling window of recent durations, and every call is also appended to
+    a bounded event log that can be exported as a Chrome trace.
+    """
+    WINDOW = 1000
+    MAX_EVENTS = 200000
+    HISTOGRAM_BUCKETS = 16  # log2 buckets of microseconds: <1us, <2us, <4us, ...
+
+    def __init__(self):
+        self.enabled = os.environ.get("CODE_TRACE_PERF") == "1"
+        self.origin_ns = time.perf_counter_ns()
+        self.clear()
+
+    def clear(self):
+        self.samples = {}
+        self.counts = {}
+        self.events = deque(maxlen=self.MAX_EVENTS)
+
+    def record(self, name, start_ns, end_ns):
+        window = self.samples.get(name)
+        if window is None:
+            window = self.samples[name] = deque(maxlen=self.WINDOW)
+            self.counts[name] = 0
+        duration = end_ns - start_ns
+        window.append(duration)
+        self.counts[name] += 1
+        self.events.append((name, start_ns, duration, threading.get_ident()))
+
+    def histogram(self, name):
+        buckets = [0] * self.HISTOGRAM_BUCKETS
+        for duration in self.samples.get(name, ()):
+            index = min((duration // 1000).bit_length(), self.HISTOGRAM_BUCKETS - 1)
+            buckets[index] += 1
+        return buckets
+
+    def summary(self):
+        """
+        Per-function statistics over the rolling window, durations in ms.
+        """
+        rows = []
+        for name, window in sorted(self.samples.items()):
+            ordered = sorted(window)
+            if not ordered:
+                continue
+            rows.append({
+                "name": name,
+                "calls": self.counts[name],
+                "mean_ms": sum(ordered) / len(ordered) / 1e6,
+                "p50_ms": ordered[len(ordered) // 2] / 1e6,
+                "p95_ms": ordered[min(len(ordered) - 1, len(ordered) * 95 // 100)] / 1e6,
+                "max_ms": ordered[-1] / 1e6,
+                "histogram": self.histogram(name)
+            })
+        return rows
+
+    def export_chrome_trace(self, filename):
+        """
+        Write the event log in Chrome trace-event format (chrome://tracing, Perfetto).
+        """
+        trace_events = []
+        pid = os.getpid()
+        for name, start_ns, duration, tid in self.events:
+            trace_events.append({
+                "name": name,
+                "ph": "X",
+                "ts": (start_ns - self.origin_ns) / 1000,
+                "dur": duration / 1000,
+                "pid": pid,
+                "tid": tid
+            })
+        data = {
+            "traceEvents": trace_events,
+            "displayTimeUnit": "ms",
+            "summary": self.summary()
+        }
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+recorder = PerfRecorder()
+
+def timed(name=None):
+    """
+    Decorator recording the wrapped function's duration into `recorder`
+    while it is enabled. Costs one attribute check when disabled.
+    """
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not recorder.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                recorder.record(label, start, time.perf_counter_ns())
+        return wrapper
+    return decorate
+
+
+class PerfPane(QDockWidget):
+    COLUMNS = ["Function", "Calls", "Mean ms", "p95 ms", "Max ms", "Histogram"]
+
+    def __init__(self, parent=None):
+        super().__init__("Performance", parent)
+        self.setObjectName("PerfPane")
+        # Shown and hidden together with recording, from the View menu
+        self.setFeatures(QDockWidget.DockWidgetMovable | QDockWidget.DockWidgetFloatable)
+
+        self.table = QTableWidget(0, len(self.COLUMNS), self)
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+
+        reset_button = QPushButton("Reset", self)
+        reset_button.clicked.connect(self.reset)
+        export_button = QPushButton("Export Chrome Trace…", self)
+        export_button.clicked.connect(self.export_trace)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(reset_button)
+        buttons.addWidget(export_button)
+        buttons.addStretch()
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+        container = QWidget(self)
+        container.setLayout(layout)
+        self.setWidget(container)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(500)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def set_recording(self, enabled):
+        recorder.enabled = enabled
+        self.setVisible(enabled)
+        if enabled:
+            self.refresh_timer.start()
+            self.refresh()
+        else:
+            self.refresh_timer.stop()
+
+    def reset(self):
+        recorder.clear()
+        self.refresh()
+
+    def refresh(self):
+        rows = recorder.summary()
+        self.table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            histogram = row["histogram"]
+            peak = max(histogram) or 1
+            bars = "".join(HISTOGRAM_BARS[(count * (len(HISTOGRAM_BARS) - 1) + peak - 1) // peak]
+                           for count in histogram)
+            cells = [
+                row["name"],
+                str(row["calls"]),
+                f"{row['mean_ms']:.3f}",
+                f"{row['p95_ms']:.3f}",
+                f"{row['max_ms']:.3f}",
+                bars
+            ]
+            for c, text in enumerate(cells):
+                self.table.setItem(r, c, QTableWidgetItem(text))
+
+    def export_trace(self):
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "Export Chrome Trace", "editor_perf.json", "JSON Files (*.json);;All Files (*)")
+        if filename:
+            recorder.export_chrome_trace(filename)
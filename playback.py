@@ -0,0 +1,200 @@
+# playback.py
+
+from array import array
+from bisect import bisect_left, bisect_right
+from PyQt5.Qsci import QsciScintilla
+from PyQt5.QtCore import QObject, pyqtSignal
+from core_lexer import LineType
+
+def splice_lines(lines, start, end, new_lines, shift):
+    """
+    Replace the entries of sorted `lines` in [start, end) by `new_lines`,
+    moving the later ones by `shift`. Returns the replaced slice bounds.
+    """
+    first = bisect_left(lines, start)
+    last = bisect_left(lines, end)
+    if shift:
+        lines[last:] = array("I", [line + shift for line in lines[last:]])
+    lines[first:last] = new_lines
+    return first, last
+
+
+class StepIndex:
+    """
+    The lines of the CODE rows (the playback steps) and FILE_ANNOTATION
+    rows in document order, and the steps whose tabs differ from the step
+    before, so every seek is a bisect. Tabs are indentation levels: in a
+    recorded trace, call depth plus nesting inside the function, so a
+    depth change is a call, a return, or a block entered or left. Kept in
+    step with the editor's rowsChanged and tabsChanged while playback is on.
+    """
+    def __init__(self, editor):
+        self.editor = editor
+        self.steps = array("I")
+        self.files = array("I")
+        self.depth_changes = array("I")
+
+    def rebuild(self):
+        CODE = LineType.CODE
+        FILE_ANNOTATION = LineType.FILE_ANNOTATION
+        steps = array("I")
+        files = array("I")
+        depth_changes = array("I")
+        tabs = self.editor.tabs
+        step_tabs = None
+        for line, rd in enumerate(self.editor.row_data):
+            if rd.line_type is CODE:
+                if tabs[line] != step_tabs:
+                    depth_changes.append(len(steps))
+                    step_tabs = tabs[line]
+                steps.append(line)
+            elif rd.line_type is FILE_ANNOTATION:
+                files.append(line)
+        self.steps = steps
+        self.files = files
+        self.depth_changes = depth_changes
+
+    def apply_delta(self, start, removed, added):
+        """
+        Rows [start, start + removed) were replaced by `added` rows.
+        """
+        row_data = self.editor.row_data
+        tabs = self.editor.tabs
+        if start == 0 and added == len(row_data):
+            self.rebuild()
+            return
+        new_rows = range(start, start + added)
+        new_steps = array("I", [line for line in new_rows if row_data[line].line_type is LineType.CODE])
+        new_files = array("I", [line for line in new_rows
+                                if row_data[line].line_type is LineType.FILE_ANNOTATION])
+        shift = added - removed
+        splice_lines(self.files, start, start + removed, new_files, shift)
+        first, last = splice_lines(self.steps, start, start + removed, new_steps, shift)
+
+        # Depth change flags of the new steps and of the step after them,
+        # which now follows a different step
+        steps = self.steps
+        depth_changes = self.depth_changes
+        low = bisect_left(depth_changes, first)
+        high = bisect_right(depth_changes, last)
+        step_shift = len(new_steps) - (last - first)
+        if step_shift:
+            depth_changes[high:] = array("I", [step + step_shift for step in depth_changes[high:]])
+        flagged = array("I")
+        for step in range(first, min(first + len(new_steps) + 1, len(steps))):
+            if step == 0 or tabs[steps[step]] != tabs[steps[step - 1]]:
+                flagged.append(step)
+        depth_changes[low:high] = flagged
+
+    def step_at(self, line):
+        """
+        The step on `line`, or the first one after it.
+        """
+        return bisect_left(self.steps, line)
+
+    def file_before(self, line):
+        """
+        Line of the nearest FILE_ANNOTATION row at or before `line`, or -1.
+        """
+        i = bisect_right(self.files, line)
+        return self.files[i - 1] if i else -1
+
+    def next_depth_change(self, step):
+        i = bisect_right(self.depth_changes, step)
+        return self.depth_changes[i] if i < len(self.depth_changes) else None
+
+    def previous_depth_change(self, step):
+        i = bisect_left(self.depth_changes, step)
+        return self.depth_changes[i - 1] if i else None
+
+
+class TracePlayer(QObject):
+    """
+    Playback of a trace in execution order: steps through its CODE rows,
+    skipping notes and file annotations, with the current row marked.
+    """
+    # Current step (-1 once playback stops), number of steps and the
+    # nearest preceding file annotation ("" for none)
+    stepChanged = pyqtSignal(int, int, str)
+
+    MARKER = 24
+
+    def __init__(self, editor, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.index = StepIndex(editor)
+        self.active = False
+        self.marker_handle = -1
+        editor.markerDefine(QsciScintilla.Background, self.MARKER)
+
+    def set_color(self, color):
+        self.editor.setMarkerBackgroundColor(color, self.MARKER)
+
+    def start(self):
+        if self.active:
+            return
+        self.active = True
+        self.index.rebuild()
+        self.editor.rowsChanged.connect(self.on_rows_changed)
+        self.editor.tabsChanged.connect(self.on_tabs_changed)
+        self.go_to_step(self.index.step_at(self.editor.getCursorPosition()[0]))
+
+    def stop(self):
+        if not self.active:
+            return
+        self.active = False
+        self.editor.rowsChanged.disconnect(self.on_rows_changed)
+        self.editor.tabsChanged.disconnect(self.on_tabs_changed)
+        self.editor.markerDeleteHandle(self.marker_handle)
+        self.marker_handle = -1
+        self.stepChanged.emit(-1, 0, "")
+
+    def on_rows_changed(self, start, removed, added):
+        self.index.apply_delta(start, removed, added)
+
+    def on_tabs_changed(self, start, end):
+        self.index.apply_delta(start, end - start, end - start)
+
+    def current_step(self):
+        """
+        The marked step; the marker follows its row through edits. If that
+        row was deleted, the step at or after the cursor.
+        """
+        line = -1
+        if self.marker_handle >= 0:
+            line = self.editor.SendScintilla(QsciScintilla.SCI_MARKERLINEFROMHANDLE, self.marker_handle)
+        if line < 0:
+            line = self.editor.getCursorPosition()[0]
+        return self.index.step_at(line)
+
+    def go_to_step(self, step):
+        steps = self.index.steps
+        if not self.active or not steps:
+            return
+        step = max(0, min(step, len(steps) - 1))
+        line = steps[step]
+        editor = self.editor
+        editor.markerDeleteHandle(self.marker_handle)
+        self.marker_handle = editor.markerAdd(line, self.MARKER)
+        editor.ensureLineVisible(line)
+        editor.setCursorPosition(line, editor.indents[line] if line < len(editor.indents) else 0)
+
+        file_line = self.index.file_before(line)
+        file_label = editor.text(file_line).strip() if file_line >= 0 else ""
+        self.stepChanged.emit(step, len(steps), file_label)
+
+    def step(self, count):
+        """
+        Move `count` steps forward (or back, if negative).
+        """
+        self.go_to_step(self.current_step() + count)
+
+    def next_depth_change(self):
+        step = self.index.next_depth_change(self.current_step())
+        if step is not None:
+            self.go_to_step(step)
+
+    def previous_depth_change(self):
+        step = self.index.previous_depth_change(self.current_step())
+        if step is not None:
+            self.go_to_step(step)
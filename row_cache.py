@@ -0,0 +1,106 @@
+# row_cache.py
+
+import time
+
+class RowCache:
+    """
+    One value per row, read with the editor's lexer and kept in step with
+    the editor's rowsChanged deltas, so an edit only re-reads the rows it
+    touched. Rows not read yet hold MISSING; fill_slice() fills them in a
+    little at a time after a new document or a large paste.
+
+    Subclasses give row_value(), and follow the values through
+    rows_replaced() and rows_filled() if they derive more from them.
+    """
+    # Deltas replacing more rows than this are left to fill_slice()
+    EAGER_ROWS = 1000
+    MISSING = None
+
+    def __init__(self, editor):
+        self.editor = editor
+        self.lexer = None
+        self.values = self.missing_values(0)
+        self.next_line = 0  # rows before it are all read
+
+    def missing_values(self, count):
+        return [self.MISSING] * count
+
+    def row_value(self, line):
+        raise NotImplementedError
+
+    def rows_replaced(self, start, old_values, new_values):
+        """
+        Rows from `start` holding old_values now hold new_values.
+        """
+
+    def rows_filled(self, first_line, end_line):
+        """
+        fill_slice() read the missing rows of first_line .. end_line - 1.
+        """
+
+    def in_sync(self):
+        return (self.lexer is self.editor.lexer()
+                and len(self.values) == len(self.editor.row_data))
+
+    def rebuild(self):
+        self.lexer = self.editor.lexer()
+        self.values = self.missing_values(len(self.editor.row_data))
+        self.next_line = 0
+
+    def sync(self):
+        """
+        Start over if the rows no longer match the editor's, unless it has
+        deltas left to publish. Returns True while rows are left to fill.
+        """
+        if not self.in_sync() and not self.editor.pending_row_deltas:
+            self.rebuild()
+        return not self.complete()
+
+    def apply_delta(self, start, removed, added):
+        """
+        Rows [start, start + removed) were replaced by `added` rows.
+        """
+        if self.lexer is not self.editor.lexer() or (start == 0 and removed == len(self.values)):
+            self.rebuild()
+            return
+        if added <= self.EAGER_ROWS and self.lexer is not None:
+            new_values = [self.row_value(line) for line in range(start, start + added)]
+            if self.next_line >= start + removed:
+                self.next_line += added - removed
+            elif self.next_line > start:
+                self.next_line = start + added
+        else:
+            new_values = self.missing_values(added)
+            self.next_line = min(self.next_line, start)
+        old_values = self.values[start:start + removed]
+        self.values[start:start + removed] = new_values
+        if not self.in_sync():
+            self.rebuild()
+        else:
+            self.rows_replaced(start, old_values, new_values)
+
+    def complete(self):
+        return self.next_line >= len(self.values)
+
+    def fill_slice(self, budget_ms):
+        """
+        Read missing rows for about budget_ms. Returns True once every row
+        is read. Skipped while the editor has row deltas it has not
+        published yet, since row numbers do not match the document then.
+        """
+        if self.editor.pending_row_deltas or not self.in_sync() or self.lexer is None:
+            return self.complete()
+        values = self.values
+        missing = self.MISSING
+        deadline = time.perf_counter() + budget_ms / 1000
+        first = line = self.next_line
+        end = len(values)
+        while line < end and time.perf_counter() < deadline:
+            for i in range(line, min(line + 64, end)):
+                if values[i] == missing:
+                    values[i] = self.row_value(i)
+            line = min(line + 64, end)
+        self.next_line = line
+        if line > first:
+            self.rows_filled(first, line)
+        return self.complete()
@@ -1,19 +1,141 @@
 # semantic_editor.py
 
+import ctypes
 import re
+import sys
+from array import array
+from bisect import bisect_right
+from itertools import islice
 from PyQt5.Qsci import QsciScintilla
 from PyQt5.QtWidgets import QAction, QApplication
 from PyQt5.QtGui import QFont, QKeySequence
-from PyQt5.QtCore import Qt, QTimer
-from core_lexer import LineType, RowData, BaseLexer
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from core_lexer import LineType, RowData, BaseLexer, BRACES
+from perf import timed
+
+LEADING_SPACES = re.compile(r"^ *", re.MULTILINE)
+
+def divided(values, divisor):
+    """
+    array("I") of value // divisor for every item of array("I") `values`,
+    in bulk: the low bytes go through one bytes.translate(), and only items
+    of 256 or more (found by their other bytes) are divided one by one.
+    """
+    itemsize = values.itemsize
+    low = 0 if sys.byteorder == "little" else itemsize - 1
+    raw = values.tobytes()
+    low_bytes = raw[low::itemsize]
+    quotients = bytearray(len(raw))
+    quotients[low::itemsize] = low_bytes.translate(bytes(value // divisor for value in range(256)))
+    result = array("I")
+    result.frombytes(quotients)
+    # Only zero bytes besides the low ones: no item is 256 or more
+    if raw.count(0) != len(raw) - len(low_bytes) + low_bytes.count(0):
+        high = bytearray(raw)
+        high[low::itemsize] = bytes(len(low_bytes))
+        high = high.translate(bytes([0]) + bytes([1]) * 255)
+        position = high.find(1)
+        while position >= 0:
+            i = position // itemsize
+            result[i] = values[i] // divisor
+            position = high.find(1, (i + 1) * itemsize)
+    return result
+
+def changed_span(old, new):
+    """
+    Smallest item range [lo, hi) outside which equal-length arrays `old`
+    and `new` are equal, or None if they are equal. Halves the range with
+    slice comparisons, which run at memcmp speed.
+    """
+    a, b = old.tobytes(), new.tobytes()
+    if a == b:
+        return None
+    lo, hi = 0, len(a)
+    while hi - lo > 64:
+        mid = (lo + hi) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid
+    first = next(i for i in range(lo, hi) if a[i] != b[i])
+    lo, hi = first, len(a)
+    while hi - lo > 64:
+        mid = (lo + hi) // 2
+        if a[mid:hi] == b[mid:hi]:
+            hi = mid
+        else:
+            lo = mid
+    last = next(i for i in reversed(range(lo, hi)) if a[i] != b[i])
+    return first // old.itemsize, last // old.itemsize + 1
+
+
+class TextRange(ctypes.Structure):
+    """
+    Scintilla's Sci_TextRange, for messages that fill a caller's buffer.
+    """
+    _fields_ = [("cpMin", ctypes.c_long), ("cpMax", ctypes.c_long), ("lpstrText", ctypes.c_char_p)]
 
 class SemanticEditor(QsciScintilla):
+    # Emitted once row_data is up to date after an edit:
+    # rows [start, start + removed) were replaced by `added` new rows.
+    rowsChanged = pyqtSignal(int, int, int)
+    # Emitted when only the tabs of rows [start, end) changed (a tab size
+    # switch): their text and line types did not, so consumers that ignore
+    # tabs keep what they derived from those rows.
+    tabsChanged = pyqtSignal(int, int)
+    # Emitted when an edit carried new brace depths past the rows it
+    # replaced: rows [start, end) kept their text but fold at a new depth.
+    depthsChanged = pyqtSignal(int, int)
+    # Emitted when setLexer() installs a different lexer (a language switch)
+    lexerChanged = pyqtSignal()
+    # Percentage of lines wrapped so far while word wrap lays out the
+    # document in the background; 100 once it has caught up
+    wrapProgress = pyqtSignal(int)
+
+    WRAP_PROBE_MS = 200
+
+    # Rows highlight_braces() looks through for a match on a cursor move;
+    # matching_brace() returns TOO_FAR past them
+    MATCH_ROWS = 100000
+    TOO_FAR = "too far"
+
+    # Only the modifications we (or QsciScintilla itself) act on are sent back
+    # from Scintilla; style-change notifications would otherwise cross into
+    # Python for every setStyling() call.
+    MOD_EVENT_MASK = (QsciScintilla.SC_MOD_INSERTTEXT | QsciScintilla.SC_MOD_DELETETEXT |
+                      QsciScintilla.SC_MOD_CHANGEFOLD | QsciScintilla.SC_MOD_CHANGEMARKER |
+                      QsciScintilla.SC_MOD_CONTAINER)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.spaces_per_tab = 4
 
         # The one shared row_data for the entire document
         self.row_data = []
+        # Leading spaces of every row, kept alongside row_data so a tab size
+        # switch only has to divide them again, and the tabs of every row
+        self.indents = array("I")
+        self.tabs = array("I")
+
+        # Row deltas recorded by on_modified(), published by flush_row_deltas().
+        # A None entry means row_data was rebuilt and consumers must resync.
+        self.pending_row_deltas = []
+        self.published_line_count = 0
+
+        # Fold levels last sent to Scintilla (None = unknown), and the region
+        # boundaries derived from them (None = rebuild on next use)
+        self.fold_levels = []
+        self.fold_regions = None
+        self.text_runs = None
+
+        # Line-type changes referenced from Scintilla's undo stack by token,
+        # the tokens currently undone (dropped once redo is no longer
+        # possible), and (position, length, line types) of every undoable
+        # deletion of lines, newest last, restored when undo re-inserts them
+        self.line_type_changes = {}
+        self.undone_line_type_changes = set()
+        self.deleted_line_types = []
+        self.next_undo_token = 1
 
         font = QFont("Courier New", 10)
         font.setStyleHint(QFont.Monospace)
@@ -29,6 +151,11 @@ class SemanticEditor(QsciScintilla):
 
         self.setFolding(QsciScintilla.BoxedFoldStyle)
 
+        self.wrap_percent = 100
+        self.wrap_timer = QTimer(self)
+        self.wrap_timer.setInterval(self.WRAP_PROBE_MS)
+        self.wrap_timer.timeout.connect(self.report_wrap_progress)
+
         # Start with a generic BaseLexer (will be replaced in MainWindow)
         self.setLexer(BaseLexer(self))
 
@@ -40,20 +167,80 @@ class SemanticEditor(QsciScintilla):
         self.copy_action.setChecked(True)
         self.copy_action.triggered.connect(self.toggle_folded_copy_filter)
 
+        self.cursorPositionChanged.connect(self.highlight_braces)
+
         self.customContextMenuRequested.connect(self.show_custom_context_menu)
         self.setContextMenuPolicy(Qt.CustomContextMenu)
 
         # Connect signals
-        self.linesChanged.connect(self.on_lines_changed)
+        self.SendScintilla(QsciScintilla.SCI_SETMODEVENTMASK, self.MOD_EVENT_MASK)
+        self.SCN_MODIFIED.connect(self.on_modified)
+        # Deferred like textChanged: QsciScintilla emits linesChanged from its own
+        # SCN_MODIFIED handler, before on_modified() has spliced row_data.
+        self.linesChanged.connect(lambda: QTimer.singleShot(0, self.on_lines_changed))
         self.textChanged.connect(lambda: QTimer.singleShot(0, self.on_text_changed))
 
         # Initialize row_data for however many lines we start with (often 1 empty line).
         self.init_row_data()
 
+    def setText(self, text):
+        super().setText(text)
+        # QsciScintilla empties the undo history along with the document
+        self.forget_undo_records()
+
+    def clear(self):
+        super().clear()
+        self.forget_undo_records()
+
+    def forget_undo_records(self):
+        """
+        Drop the line types kept for Scintilla's undo history, once it has
+        been emptied.
+        """
+        self.line_type_changes = {}
+        self.undone_line_type_changes = set()
+        self.deleted_line_types = []
+
+    def prune_redo_records(self):
+        """
+        Drop the undone line-type changes once a new action has discarded
+        Scintilla's redo history, as they can never be redone.
+        """
+        if self.undone_line_type_changes and not self.SendScintilla(QsciScintilla.SCI_CANREDO):
+            for token in self.undone_line_type_changes:
+                del self.line_type_changes[token]
+            self.undone_line_type_changes = set()
+
+    def setLexer(self, lexer=None):
+        changed = lexer is not self.lexer()
+        super().setLexer(lexer)
+        if changed:
+            self.lexerChanged.emit()
+
     def init_row_data(self):
         line_count = self.lines()
-        self.row_data = [RowData(0, LineType.CODE) for _ in range(line_count)]
+        self.row_data = [RowData(LineType.CODE) for _ in range(line_count)]
+        self.scan_indents()
+        self.update_tabs()
         self.last_line_count = line_count
+        self.pending_row_deltas.append(None)
+
+    def scan_indents(self):
+        """
+        Leading-space count of every line, in one regex pass over the text.
+        """
+        self.indents = array("I", map(len, LEADING_SPACES.findall(self.text())))
+
+    def update_tabs(self):
+        """
+        Derive every row's tabs from its stored indent, as one new array.
+        Returns the span [lo, hi) of rows whose tabs changed, or None.
+        """
+        old_tabs = self.tabs
+        tabs = self.tabs = divided(self.indents, self.spaces_per_tab)
+        if len(tabs) != len(old_tabs):
+            return (0, len(tabs)) if tabs else None
+        return changed_span(old_tabs, tabs)
 
     def toggle_folded_copy_filter(self):
         self.filter_folded_copy_enabled = not self.filter_folded_copy_enabled
@@ -80,26 +267,158 @@ class SemanticEditor(QsciScintilla):
             if visible_lines:
                 QApplication.clipboard().setText("\n".join(visible_lines))
 
+    def on_modified(self, position, mod_type, text, length, lines_added,
+                    _line, _fold_now, _fold_prev, token, *_):
+        """
+        Splice row_data where Scintilla inserted or removed lines, so every row
+        keeps following its own text, and record the affected range.
+        """
+        if mod_type & QsciScintilla.SC_MOD_CONTAINER:
+            self.undo_line_types(token, bool(mod_type & QsciScintilla.SC_PERFORMED_UNDO))
+            return
+        if not mod_type & (QsciScintilla.SC_MOD_INSERTTEXT | QsciScintilla.SC_MOD_DELETETEXT):
+            return
+        if mod_type & QsciScintilla.SC_PERFORMED_USER:
+            self.prune_redo_records()
+        if len(self.row_data) != self.lines() - lines_added:
+            # row_data was replaced behind Scintilla's back; update_row_data() realigns it
+            self.pending_row_deltas.append(None)
+            return
+
+        line = self.SendScintilla(QsciScintilla.SCI_LINEFROMPOSITION, position)
+        line_start = self.SendScintilla(QsciScintilla.SCI_POSITIONFROMLINE, line)
+        # Whole lines inserted/removed at a line start leave row `line` untouched
+        whole_lines = position == line_start and bool(text) and text.endswith(b"\n")
+
+        if lines_added > 0:
+            # New lines become TEXT if the line they were split from is TEXT; else CODE
+            anchor_type = self.row_data[line].line_type
+            new_line_type = LineType.TEXT if anchor_type == LineType.TEXT else LineType.CODE
+            new_rows = [RowData(new_line_type) for _ in range(lines_added)]
+            new_indents = array("I", [0]) * lines_added
+            first = line if whole_lines else line + 1
+            if mod_type & QsciScintilla.SC_PERFORMED_UNDO and self.deleted_line_types:
+                # Undoing a deletion brings back the rows' own types
+                deleted_position, deleted_length, types = self.deleted_line_types[-1]
+                if (deleted_position, deleted_length) == (position, length) and len(types) == lines_added:
+                    self.deleted_line_types.pop()
+                    for rd, value in zip(new_rows, types):
+                        rd.line_type = LineType(value)
+            self.row_data[first:first] = new_rows
+            self.indents[first:first] = new_indents
+            self.tabs[first:first] = new_indents
+            delta = (line, 0, lines_added) if whole_lines else (line, 1, lines_added + 1)
+            # Scintilla gives inserted lines a copy of a neighbour's level
+            self.fold_levels[line:line + 1] = [None] * (lines_added + 1)
+        elif lines_added < 0:
+            removed = -lines_added
+            first = line if whole_lines else line + 1
+            if (not mod_type & QsciScintilla.SC_PERFORMED_UNDO
+                    and self.SendScintilla(QsciScintilla.SCI_GETUNDOCOLLECTION)):
+                self.deleted_line_types.append(
+                    (position, length, bytes(rd.line_type.value for rd in self.row_data[first:first + removed])))
+            del self.row_data[first:first + removed]
+            del self.indents[first:first + removed]
+            del self.tabs[first:first + removed]
+            delta = (line, removed, 0) if whole_lines else (line, removed + 1, 1)
+            # Scintilla may clear the header flag of the line before a removal
+            self.fold_levels[max(line - 1, 0):line + 1 + removed] = [None] * min(line + 1, 2)
+        else:
+            delta = (line, 1, 1)
+        if self.length() == 0:
+            # Scintilla resets the fold level of an emptied document
+            self.fold_levels = []
+        self.pending_row_deltas.append(delta)
+
+    def flush_row_deltas(self):
+        """
+        Publish the recorded row deltas through rowsChanged, merged into one
+        delta so consumers can read the rows it covers in their current state.
+        A pending reset becomes a single whole-document delta.
+        """
+        if not self.pending_row_deltas:
+            return
+        span = self.pending_dirty_span()
+        if span is None:
+            delta = (0, self.published_line_count, len(self.row_data))
+        else:
+            lo, hi = span
+            net = sum(added - removed for _, removed, added in self.pending_row_deltas)
+            delta = (lo, hi - lo - net, hi - lo)
+        self.pending_row_deltas = []
+        self.published_line_count = len(self.row_data)
+        self.rowsChanged.emit(*delta)
+
+    def pending_dirty_span(self):
+        """
+        Smallest row range [lo, hi), in current line numbers, covering every
+        row touched by the pending deltas. None if a reset is pending.
+        """
+        lo = hi = None
+        for delta in self.pending_row_deltas:
+            if delta is None:
+                return None
+            start, removed, added = delta
+            if lo is None:
+                lo, hi = start, start + added
+                continue
+            shift = added - removed
+            # Map the span through this delta, then merge in the replaced rows
+            lo = lo if lo < start else (lo + shift if lo >= start + removed else start)
+            hi = hi if hi <= start else (hi + shift if hi >= start + removed else start + added)
+            lo, hi = min(lo, start), max(hi, start + added)
+        if lo is None:
+            return 0, 0
+        return lo, hi
+
     def on_text_changed(self):
         """
         If line count didn't change, we only update indentation/folding.
         """
         if self.lines() == self.last_line_count:
+            read_only = self.isReadOnly()
             self.setReadOnly(True)
-            self.update_row_data()
-            self.apply_folding()
-            self.setReadOnly(False)
+            self.update_changed_rows()
+            self.setReadOnly(read_only)
 
     def on_lines_changed(self):
         """
-        If the line count changed, rely on update_row_data() to handle it safely.
+        If the line count changed, rely on update_changed_rows() to handle it safely.
         """
+        read_only = self.isReadOnly()
         self.setReadOnly(True)
         self.last_line_count = self.lines()
-        self.update_row_data()
-        self.apply_folding()
-        self.setReadOnly(False)
+        self.update_changed_rows()
+        self.setReadOnly(read_only)
 
+    @timed()
+    def update_changed_rows(self):
+        """
+        Incremental update_row_data() + apply_folding() for edits: only the
+        rows touched since the last flush get their tabs recomputed and their
+        folding refreshed. Scintilla restyles edited text by itself.
+        """
+        span = self.pending_dirty_span()
+        if span is None or len(self.row_data) != self.lines():
+            self.update_row_data()
+            self.apply_folding()
+            return
+        lo, hi = span
+        for i in range(lo, hi):
+            line_text = self.text(i)
+            leading_spaces = len(line_text) - len(line_text.lstrip(' '))
+            self.indents[i] = leading_spaces
+            self.tabs[i] = leading_spaces // self.spaces_per_tab
+        carried = hi
+        if self.pending_row_deltas:
+            if self.brace_folding():
+                carried = self.update_brace_depths(lo, hi)
+            self.apply_folding(lo, max(hi, carried))
+        self.flush_row_deltas()
+        if carried > hi:
+            self.depthsChanged.emit(hi, carried)
+
+    @timed()
     def update_row_data(self):
         """
         Re-align row_data length with the number of lines.
@@ -121,56 +440,612 @@ class SemanticEditor(QsciScintilla):
             for _ in range(needed):
                 # If the last line was TEXT, new lines become TEXT; else CODE
                 new_line_type = LineType.TEXT if last_type == LineType.TEXT else LineType.CODE
-                self.row_data.append(RowData(0, new_line_type))
+                self.row_data.append(RowData(new_line_type))
 
         # Recalculate indentation
-        for i in range(line_count):
-            line_text = self.text(i)
-            leading_spaces = len(line_text) - len(line_text.lstrip(' '))
-            self.row_data[i].tabs = leading_spaces // self.spaces_per_tab
+        self.scan_indents()
+        self.update_tabs()
+
+        if self.brace_folding():
+            self.update_brace_depths()
 
         # Force restyling
         if self.lexer():
             self.lexer().styleText(0, 0)
 
-    def apply_folding(self):
+        self.flush_row_deltas()
+
+    def brace_folding(self):
+        lexer = self.lexer()
+        return lexer is not None and lexer.BRACE_FOLDING
+
+    @timed()
+    def update_brace_depths(self, first_line=0, end_line=None, rescan=True):
+        """
+        Rescan the code braces of rows first_line .. end_line - 1 and carry
+        the brace depth forward until, past end_line, a row already has the
+        depth it would get. Depth restarts at 0 after every FILE_ANNOTATION
+        row, which bounds how far an unbalanced edit propagates. Returns the
+        end of the rows whose depth may have changed. With rescan=False the
+        braces already stored are trusted and only depths are carried.
+        """
+        lexer = self.lexer()
+        row_data = self.row_data
+        line_count = len(row_data)
+        if end_line is None:
+            end_line = line_count
+        depth = self.depth_after(row_data[first_line - 1]) if first_line > 0 else 0
+
+        for i in range(first_line, line_count):
+            rd = row_data[i]
+            if rd.line_type == LineType.FILE_ANNOTATION:
+                depth = 0
+            if i >= end_line and rd.braces is not None and rd.depth == depth:
+                return i
+            if rescan and (i < end_line or rd.braces is None):
+                braces = lexer.code_braces(self.text(i)) if rd.line_type == LineType.CODE else ()
+                rd.braces = braces
+            rd.depth = low = depth
+            # A line starting with closers folds at the depth they return to
+            fold_depth = None
+            for _, brace in rd.braces:
+                if brace == "{":
+                    if fold_depth is None:
+                        fold_depth = depth
+                    depth += 1
+                elif depth:
+                    depth -= 1
+                    if depth < low:
+                        low = depth
+            rd.fold_depth = depth if fold_depth is None else fold_depth
+            rd.low = low
+        return line_count
+
+    @staticmethod
+    def depth_after(rd):
+        if rd.line_type == LineType.FILE_ANNOTATION:
+            return 0
+        depth = rd.depth
+        for _, brace in rd.braces or ():
+            depth = depth + 1 if brace == "{" else max(depth - 1, 0)
+        return depth
+
+    @staticmethod
+    def brace_depths(rd):
+        """
+        (column, brace, depth before it) of each of the row's code braces.
+        """
+        depth = rd.depth
+        result = []
+        for column, brace in rd.braces or ():
+            result.append((column, brace, depth))
+            depth = depth + 1 if brace == "{" else max(depth - 1, 0)
+        return result
+
+    def brace_at_cursor(self):
+        """
+        (line, column) of the code brace after the cursor, else of the one
+        before it. None if neither is a brace.
+        """
+        if not self.brace_folding():
+            return None
+        line, index = self.getCursorPosition()
+        if line >= len(self.row_data):
+            return None
+        braces = self.row_data[line].braces
+        if not braces:
+            return None
+        columns = [column for column, _ in braces]
+        for column in (index, index - 1):
+            if column in columns:
+                return line, column
+        return None
+
+    def matching_brace(self, line, column, max_rows=None):
+        """
+        (line, column) of the brace paired with the one at (line, column),
+        or None. Depth counts open braces (a closer at depth 0 pairs with
+        nothing), so the match is the nearest brace that takes the depth
+        back to where this one found it. Rows in between are skipped by
+        their lowest depth, and only the row holding the match has its
+        braces walked. Braces never pair across a FILE_ANNOTATION row.
+
+        With max_rows, gives up after that many rows and returns TOO_FAR.
+        """
+        row_data = self.row_data
+        braces = self.brace_depths(row_data[line])
+        i = [c for c, _, _ in braces].index(column)
+        _, brace, depth = braces[i]
+        if brace == "{":
+            for c, b, d in braces[i + 1:]:
+                if b == "}" and d == depth + 1:
+                    return line, c
+            # The closer is on the first row after this one to get back down to depth
+            rows = range(line + 1, len(row_data))
+            want, pairs_with = "}", depth + 1
+        else:
+            if depth == 0:
+                return None
+            for c, b, d in reversed(braces[:i]):
+                if b == "{" and d == depth - 1:
+                    return line, c
+            # The opener is on the first row before this one to get down below depth
+            rows = range(line - 1, -1, -1)
+            depth -= 1
+            want, pairs_with = "{", depth
+        if max_rows is not None and len(rows) > max_rows:
+            rows = rows[:max_rows]
+            too_far = self.TOO_FAR
+        else:
+            too_far = None
+        for line in rows:
+            if row_data[line].low <= depth:
+                break
+        else:
+            return too_far
+        rd = row_data[line]
+        if rd.line_type == LineType.FILE_ANNOTATION:
+            return None
+        braces = self.brace_depths(rd)
+        if want == "{":
+            braces.reverse()
+        for c, b, d in braces:
+            if b == want and d == pairs_with:
+                return line, c
+        return None
+
+    def highlight_braces(self):
+        brace = self.brace_at_cursor()
+        if brace is None:
+            self.SendScintilla(QsciScintilla.SCI_BRACEHIGHLIGHT, -1, -1)
+            return
+        position = self.positionFromLineIndex(*brace)
+        match = self.matching_brace(*brace, max_rows=self.MATCH_ROWS)
+        if match is self.TOO_FAR:
+            # Not looked up on a cursor move; go_to_matching_brace() still finds it
+            self.SendScintilla(QsciScintilla.SCI_BRACEHIGHLIGHT, position, -1)
+        elif match is None:
+            self.SendScintilla(QsciScintilla.SCI_BRACEBADLIGHT, position)
+        else:
+            self.SendScintilla(QsciScintilla.SCI_BRACEHIGHLIGHT, position,
+                               self.positionFromLineIndex(*match))
+
+    def go_to_matching_brace(self):
+        brace = self.brace_at_cursor()
+        match = self.matching_brace(*brace) if brace else None
+        if match is not None:
+            self.setCursorPosition(*match)
+            self.ensureLineVisible(match[0])
+
+    @timed()
+    def apply_folding(self, first_line=0, end_line=None):
+        """
+        Fold by line type first, then by indentation (or brace depth, for
+        lexers with BRACE_FOLDING): a FILE_ANNOTATION line folds everything
+        up to the next one, a run of TEXT lines folds under its first line,
+        and code nests by tabs inside its file region.
+
+        Levels are recomputed from first_line until, past end_line, they match
+        what Scintilla already has; only changed levels are sent.
+        """
         SC_FOLDLEVELBASE = 0x0000
         SC_FOLDLEVELHEADERFLAG = 0x2000
+        SC_FOLDLEVELNUMBERMASK = 0x0FFF
+
+        FILE_ANNOTATION = LineType.FILE_ANNOTATION
+        TEXT = LineType.TEXT
 
         line_count = self.lines()
+        row_data = self.row_data
+        tabs = self.tabs
+        brace_folding = self.brace_folding()
+        sent = self.fold_levels
+        if len(sent) != line_count:
+            sent = [None] * line_count
+        if end_line is None:
+            end_line = line_count
+
+        # Resume from the nearest earlier line whose level is known
+        start = min(first_line, line_count)
+        while start > 0 and sent[start - 1] is None:
+            start -= 1
+        state = self.fold_state_before(start, sent)
+        if state is None:
+            start = 0
+            state = (0, 0, None)
+        file_depth, note_level, prev_type = state
+
+        levels = []  # raw levels of lines start .. stop - 1
+        for i in range(start, line_count):
+            rd = row_data[i]
+            line_type = rd.line_type
+            if line_type is FILE_ANNOTATION:
+                level = SC_FOLDLEVELBASE
+                file_depth = 1
+                converged = True
+            elif line_type is TEXT and prev_type is TEXT:
+                level = note_level + 1
+                converged = False  # a note continuation does not pin down the file depth
+            else:
+                level = SC_FOLDLEVELBASE + file_depth + (rd.fold_depth if brace_folding else tabs[i])
+                note_level = level
+                converged = True
+            prev_type = line_type
+            # Past the changed rows (and the row right after them, whose role
+            # depends on its predecessor), an unchanged level means the scan
+            # state is the same as before, so nothing further can change
+            if (converged and i > end_line and sent[i] is not None
+                    and sent[i] & SC_FOLDLEVELNUMBERMASK == level):
+                break
+            levels.append(level)
+        stop = start + len(levels)
+
+        # Header flags change for the recomputed lines and the line before
+        # them, so line i is flagged from its raw level and line i + 1's
+        first = max(start - 1, 0)
+        if first < start:
+            levels.insert(0, sent[first] & SC_FOLDLEVELNUMBERMASK)
+        levels.append(sent[stop] & SC_FOLDLEVELNUMBERMASK if stop < line_count else 0)
+        # QsciScintilla hears of level changes only to keep folded headers
+        # consistent; with none folded, each notification would be a no-op
+        quiet = self.SendScintilla(QsciScintilla.SCI_CONTRACTEDFOLDNEXT, 0) < 0
+        if quiet:
+            self.SendScintilla(QsciScintilla.SCI_SETMODEVENTMASK, self.MOD_EVENT_MASK &
+                               ~(QsciScintilla.SC_MOD_CHANGEFOLD | QsciScintilla.SC_MOD_CHANGEMARKER))
+        changed = False
+        for i, level, next_level in zip(range(first, stop), levels, islice(levels, 1, None)):
+            if next_level > level:
+                level |= SC_FOLDLEVELHEADERFLAG
+            if sent[i] != level:
+                self.SendScintilla(QsciScintilla.SCI_SETFOLDLEVEL, i, level)
+                sent[i] = level
+                changed = True
+        if quiet:
+            self.SendScintilla(QsciScintilla.SCI_SETMODEVENTMASK, self.MOD_EVENT_MASK)
+        self.fold_levels = sent
+        if changed:
+            self.fold_regions = None
+
+    def fold_state_before(self, start, sent):
+        """
+        Scan state of apply_folding() (file depth, note-run level, previous
+        line type) just before `start`, recovered from the levels already sent.
+        Returns None when it cannot be recovered.
+        """
+        SC_FOLDLEVELNUMBERMASK = 0x0FFF
+        if start == 0:
+            return 0, 0, None
+        row_data = self.row_data
+        prev_type = row_data[start - 1].line_type
+        # Back up to the first line of a TEXT run: its level is file depth + nesting
+        anchor = start - 1
+        while (anchor > 0 and row_data[anchor].line_type == LineType.TEXT
+               and row_data[anchor - 1].line_type == LineType.TEXT):
+            anchor -= 1
+        if sent[anchor] is None:
+            return None
+        anchor_level = sent[anchor] & SC_FOLDLEVELNUMBERMASK
+        if row_data[anchor].line_type == LineType.FILE_ANNOTATION:
+            return 1, 0, prev_type
+        nesting = row_data[anchor].fold_depth if self.brace_folding() else self.tabs[anchor]
+        return anchor_level - nesting, anchor_level, prev_type
+
+    def fold_region_cache(self):
+        """
+        Fold regions (header, last line, line type) and TEXT runs derived from
+        the current fold levels. Rebuilt only after the levels change.
+        """
+        SC_FOLDLEVELHEADERFLAG = 0x2000
+        SC_FOLDLEVELNUMBERMASK = 0x0FFF
+        if self.fold_regions is not None:
+            return self.fold_regions, self.text_runs
+
+        row_data = self.row_data
+        line_count = min(len(self.fold_levels), len(row_data))
+        fold_regions = []
+        text_runs = []
+        open_headers = []
         for i in range(line_count):
-            indent = self.row_data[i].tabs
-            fold_level = SC_FOLDLEVELBASE + indent
+            sent = self.fold_levels[i] or 0
+            level = sent & SC_FOLDLEVELNUMBERMASK
+            while open_headers and open_headers[-1][1] >= level:
+                header, _ = open_headers.pop()
+                fold_regions.append((header, i - 1, row_data[header].line_type))
+            if sent & SC_FOLDLEVELHEADERFLAG:
+                open_headers.append((i, level))
+            if row_data[i].line_type == LineType.TEXT:
+                if text_runs and text_runs[-1][1] == i - 1:
+                    text_runs[-1][1] = i
+                else:
+                    text_runs.append([i, i])
+        for header, _ in open_headers:
+            fold_regions.append((header, line_count - 1, row_data[header].line_type))
+        fold_regions.sort()
+        self.fold_regions = fold_regions
+        self.text_runs = text_runs
+        return fold_regions, text_runs
 
-            if i + 1 < line_count:
-                next_indent = self.row_data[i+1].tabs
-                if next_indent > indent:
-                    fold_level |= SC_FOLDLEVELHEADERFLAG
+    def collapse_all_code(self):
+        """
+        Contract every outermost CODE fold region, one Scintilla call per region.
+        """
+        fold_regions, _ = self.fold_region_cache()
+        covered_until = -1
+        for header, last, line_type in fold_regions:
+            if line_type != LineType.CODE or header <= covered_until:
+                continue
+            self.SendScintilla(QsciScintilla.SCI_FOLDLINE, header, QsciScintilla.SC_FOLDACTION_CONTRACT)
+            covered_until = last
+
+    def show_only_notes(self):
+        """
+        Hide everything between runs of TEXT lines, one Scintilla call per gap.
+        Scintilla never hides line 0.
+        """
+        _, text_runs = self.fold_region_cache()
+        self.expand_all()
+        next_visible = 1
+        for start, end in text_runs:
+            if start > next_visible:
+                self.SendScintilla(QsciScintilla.SCI_HIDELINES, next_visible, start - 1)
+            next_visible = max(end + 1, 1)
+        if next_visible < self.lines():
+            self.SendScintilla(QsciScintilla.SCI_HIDELINES, next_visible, self.lines() - 1)
 
-            self.SendScintilla(QsciScintilla.SCI_SETFOLDLEVEL, i, fold_level)
+    def expand_all(self):
+        self.SendScintilla(QsciScintilla.SCI_SHOWLINES, 0, self.lines() - 1)
+        self.SendScintilla(QsciScintilla.SCI_FOLDALL, QsciScintilla.SC_FOLDACTION_EXPAND)
 
     def set_line_type(self, line_idx, line_type):
-        self.beginUndoAction()
-        self.row_data[line_idx].line_type = line_type
-        if self.lexer():
-            self.lexer().styleText(0, 0)
-        self.endUndoAction()
+        self.set_line_types(line_idx, line_idx, line_type)
 
     def set_current_line_type(self, line_type):
-        self.beginUndoAction()
         if self.hasSelectedText():
             start_line, _, end_line, _ = self.getSelection()
-            for line_idx in range(start_line, end_line + 1):
-                self.row_data[line_idx].line_type = line_type
         else:
-            current_line = self.getCursorPosition()[0]
-            self.row_data[current_line].line_type = line_type
-        if self.lexer():
-            self.lexer().styleText(0, 0)
+            start_line = end_line = self.getCursorPosition()[0]
+        self.set_line_types(start_line, end_line, line_type)
+
+    def set_line_types(self, start_line, end_line, line_type):
+        """
+        Change the type of lines start_line..end_line as one undoable step.
+        Scintilla's undo stack holds a container action whose token maps to
+        the range and its previous types (one byte per line).
+        """
+        old_types = bytes(rd.line_type.value for rd in self.row_data[start_line:end_line + 1])
+        token = self.next_undo_token
+        self.next_undo_token += 1
+        self.line_type_changes[token] = (start_line, old_types, line_type.value)
+
+        self.beginUndoAction()
+        self.assign_line_types(start_line, bytes([line_type.value]) * len(old_types))
+        self.SendScintilla(QsciScintilla.SCI_ADDUNDOACTION, token, 0)
         self.endUndoAction()
+        self.prune_redo_records()
+        self.refresh_lines(start_line, end_line)
+
+    def assign_line_types(self, start_line, types):
+        for offset, value in enumerate(types):
+            self.row_data[start_line + offset].line_type = LineType(value)
+        self.pending_row_deltas.append((start_line, len(types), len(types)))
 
+    def undo_line_types(self, token, undo):
+        """
+        Called for our container action when Scintilla undoes or redoes it.
+        row_data is updated right away; restyling waits until Scintilla is
+        out of its notification.
+        """
+        change = self.line_type_changes.get(token)
+        if change is None:
+            return
+        if undo:
+            self.undone_line_type_changes.add(token)
+        else:
+            self.undone_line_type_changes.discard(token)
+        start_line, old_types, new_value = change
+        types = old_types if undo else bytes([new_value]) * len(old_types)
+        self.assign_line_types(start_line, types)
+        end_line = start_line + len(types) - 1
+        QTimer.singleShot(0, lambda: self.refresh_lines(start_line, end_line))
+
+    def refresh_lines(self, start_line, end_line):
+        """
+        Restyle just the given lines after a line-type change, then refold
+        them along with any edits still pending.
+        """
+        end_line = min(end_line, self.lines() - 1)
+        if self.lexer() and start_line <= end_line:
+            self.lexer().restyle_lines(start_line, end_line)
+        self.update_changed_rows()
+
+    def append_rows(self, rows):
+        """
+        Append (LineType, text) rows at the end of the document. The text goes
+        through the normal edit path, so only the new rows get tabs, folding
+        and (once visible) styling. Appends are kept out of the undo history:
+        they only add text after every position it records.
+        """
+        if not rows:
+            return
+        empty = self.length() == 0
+        first_row = 0 if empty else self.lines()
+        text = "\n".join(text for _, text in rows)
+        if not empty:
+            text = "\n" + text
+        # Not self.append(): QsciScintilla empties the undo buffer after appending
+        data = text.encode("utf-8")
+        position = self.length()
+        lines_added = len(rows) - empty
+        # QScintilla counts the characters up to an insertion on every insert
+        # notification, the whole document for an append; the splice is
+        # recorded and announced here instead
+        self.SendScintilla(QsciScintilla.SCI_SETMODEVENTMASK,
+                           self.MOD_EVENT_MASK & ~QsciScintilla.SC_MOD_INSERTTEXT)
+        self.SendScintilla(QsciScintilla.SCI_SETUNDOCOLLECTION, False)
+        self.SendScintilla(QsciScintilla.SCI_APPENDTEXT, len(data), data)
+        self.SendScintilla(QsciScintilla.SCI_SETUNDOCOLLECTION, True)
+        self.SendScintilla(QsciScintilla.SCI_SETMODEVENTMASK, self.MOD_EVENT_MASK)
+        self.on_modified(position, QsciScintilla.SC_MOD_INSERTTEXT, data, len(data), lines_added,
+                         0, 0, 0, 0)
+        self.textChanged.emit()
+        if lines_added:
+            self.linesChanged.emit()
+        for offset, (line_type, _) in enumerate(rows):
+            self.row_data[first_row + offset].line_type = line_type
+
+    def style_bytes(self):
+        """
+        Style byte of every document position, styling whatever Scintilla
+        has not styled yet first.
+        """
+        length = self.length()
+        self.SendScintilla(QsciScintilla.SCI_COLOURISE,
+                           self.SendScintilla(QsciScintilla.SCI_GETENDSTYLED), -1)
+        buffer = ctypes.create_string_buffer(2 * length + 2)
+        text_range = TextRange(0, length, ctypes.cast(buffer, ctypes.c_char_p))
+        self.SendScintilla(QsciScintilla.SCI_GETSTYLEDTEXT, 0, ctypes.addressof(text_range))
+        # The buffer interleaves each character byte with its style byte
+        return buffer.raw[1:2 * length:2]
+
+    @timed()
+    def restore_snapshot(self, styles, fold_levels):
+        """
+        Apply style bytes and fold levels saved from this same document in
+        bulk, instead of tokenizing and refolding it. Returns False (and
+        changes nothing) if they do not fit the document.
+        """
+        if len(styles) != self.length() or len(fold_levels) != self.lines():
+            return False
+        self.SendScintilla(QsciScintilla.SCI_STARTSTYLING, 0, 0)
+        self.SendScintilla(QsciScintilla.SCI_SETSTYLINGEX, len(styles), styles)
+
+        # A fresh document has nothing folded, so QsciScintilla does not need
+        # to hear about each level change (sent as CHANGEFOLD | CHANGEMARKER)
+        self.SendScintilla(QsciScintilla.SCI_SETMODEVENTMASK, self.MOD_EVENT_MASK &
+                           ~(QsciScintilla.SC_MOD_CHANGEFOLD | QsciScintilla.SC_MOD_CHANGEMARKER))
+        for line, level in enumerate(fold_levels):
+            self.SendScintilla(QsciScintilla.SCI_SETFOLDLEVEL, line, level)
+        self.SendScintilla(QsciScintilla.SCI_SETMODEVENTMASK, self.MOD_EVENT_MASK)
+        self.fold_levels = list(fold_levels)
+        self.fold_regions = None
+
+        if self.brace_folding():
+            self.braces_from_styles(styles)
+        return True
+
+    def braces_from_styles(self, styles):
+        """
+        Fill in row braces from restored styles: a code brace is a { or }
+        styled as CODE_DEFAULT_STYLE within the first LONG_LINE columns,
+        exactly what the lexer would report.
+        """
+        text = self.text()
+        if not text.isascii():
+            # Style bytes are per UTF-8 byte; let the lexer find the braces
+            self.update_brace_depths()
+            return
+        lexer = self.lexer()
+        default_style = lexer.CODE_DEFAULT_STYLE
+        line_starts = [0] + [m.end() for m in re.finditer("\n", text)]
+        braces = {}
+        for m in BRACES.finditer(text):
+            position = m.start()
+            if styles[position] == default_style:
+                line = bisect_right(line_starts, position) - 1
+                column = position - line_starts[line]
+                if column < lexer.LONG_LINE:
+                    braces.setdefault(line, []).append((column, m.group()))
+        for line, rd in enumerate(self.row_data):
+            rd.braces = tuple(braces.get(line, ()))
+        self.update_brace_depths(rescan=False)
+
+    def set_word_wrap(self, enabled):
+        """
+        Scintilla wraps the visible lines on the next paint and the rest in
+        ~10 ms idle slices. Unlike QsciScintilla.setWrapMode(), the layout
+        cache stays page-sized instead of holding every line's layout, and
+        text after the viewport is styled ahead in idle time. Progress is
+        reported through wrapProgress while wrapping is on.
+        """
+        if enabled:
+            self.SendScintilla(QsciScintilla.SCI_SETLAYOUTCACHE, QsciScintilla.SC_CACHE_PAGE)
+            self.SendScintilla(QsciScintilla.SCI_SETIDLESTYLING, QsciScintilla.SC_IDLESTYLING_AFTERVISIBLE)
+            self.SendScintilla(QsciScintilla.SCI_SETWRAPMODE, QsciScintilla.SC_WRAP_WORD)
+            self.wrap_timer.start()
+        else:
+            self.wrap_timer.stop()
+            self.SendScintilla(QsciScintilla.SCI_SETWRAPMODE, QsciScintilla.SC_WRAP_NONE)
+            self.SendScintilla(QsciScintilla.SCI_SETIDLESTYLING, QsciScintilla.SC_IDLESTYLING_NONE)
+            self.SendScintilla(QsciScintilla.SCI_SETLAYOUTCACHE, QsciScintilla.SC_CACHE_CARET)
+            self.report_wrap_progress()
+
+    def wrap_frontier(self):
+        """
+        First line the background wrap has not reached (lines() when done).
+        Scintilla wraps top to bottom, and a line that needs several display
+        lines keeps its old height until it is wrapped, so a binary search
+        comparing stored heights of such lines with SCI_WRAPCOUNT finds it.
+        """
+        line_count = self.lines()
+        lo, hi = 0, line_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            wrapped = True
+            # The nearest line that wraps at all decides; short lines look
+            # the same either way
+            for line in range(mid, min(mid + 16, hi)):
+                wrap_count = self.SendScintilla(QsciScintilla.SCI_WRAPCOUNT, line)
+                if wrap_count > 1:
+                    if line + 1 < line_count and self.SendScintilla(QsciScintilla.SCI_GETLINEVISIBLE, line):
+                        height = (self.SendScintilla(QsciScintilla.SCI_VISIBLEFROMDOCLINE, line + 1) -
+                                  self.SendScintilla(QsciScintilla.SCI_VISIBLEFROMDOCLINE, line))
+                        wrapped = height == wrap_count
+                    break
+            if wrapped:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def report_wrap_progress(self):
+        if self.SendScintilla(QsciScintilla.SCI_GETWRAPMODE) == QsciScintilla.SC_WRAP_NONE:
+            percent = 100
+        else:
+            percent = self.wrap_frontier() * 100 // max(self.lines(), 1)
+        if percent >= 100:
+            # Nothing left to wrap; set_word_wrap() probes again
+            self.wrap_timer.stop()
+        if percent != self.wrap_percent:
+            self.wrap_percent = percent
+            self.wrapProgress.emit(percent)
+
+    def load_rows(self, text, rows, tab_size):
+        """
+        Replace the document with `text` and its (line_type, tabs) rows
+        without restyling or refolding it up front. Scintilla asks the lexer
+        for just the lines it paints, which keeps huge read-only views cheap.
+        """
+        self.spaces_per_tab = tab_size
+        self.setTabWidth(tab_size)
+        self.setText(text)
+        self.init_row_data()
+        for i, (rd, (line_type, tabs)) in enumerate(zip(self.row_data, rows)):
+            rd.line_type = LineType(line_type)
+            self.tabs[i] = tabs
+        self.flush_row_deltas()
+
+    @timed()
     def set_tab_size(self, size):
+        """
+        Re-divide the stored indents: nothing is re-read or restyled, only
+        the rows whose tabs changed are refolded, and they are announced
+        through tabsChanged rather than as replaced rows.
+        """
         self.spaces_per_tab = size
         self.setTabWidth(size)
-        self.update_row_data()
-        self.apply_folding()
+        span = self.update_tabs()
+        if span is None:
+            return
+        if not self.brace_folding():
+            self.apply_folding(*span)
+        self.tabsChanged.emit(*span)
@@ -0,0 +1,67 @@
+# snapshot_cache.py
+
+import hashlib
+import os
+import struct
+import zlib
+from array import array
+
+# A .trace file's snapshot lives next to it as "<name>.trace.cache": the
+# style byte of every document position and the fold level of every line,
+# each zlib-compressed. The header key covers everything they depend on, so
+# a stale snapshot is simply never used.
+MAGIC = b"CTSNAP1\n"
+HEADER = struct.Struct("<32sIII")  # key, line count, packed styles size, packed levels size
+
+def snapshot_path(filename):
+    return filename + ".cache"
+
+def snapshot_key(text, line_types, lexer, tab_size):
+    """
+    Digest of the document text and line types, the lexer (language and
+    VERSION) and the tab size.
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    digest.update(f"{lexer.language()}:{lexer.VERSION}:{tab_size}\n".encode("utf-8"))
+    digest.update(bytes(line_types))
+    digest.update(text.encode("utf-8"))
+    return digest.digest()
+
+def read_snapshot(filename, key):
+    """
+    (style bytes, fold levels) stored for `filename` under `key`, or None
+    if there is no snapshot, it was made for other content or it is damaged.
+    """
+    try:
+        with open(snapshot_path(filename), "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            stored_key, line_count, styles_size, levels_size = HEADER.unpack(f.read(HEADER.size))
+            if stored_key != key:
+                return None
+            styles = zlib.decompress(f.read(styles_size))
+            levels = array("I")
+            levels.frombytes(zlib.decompress(f.read(levels_size)))
+    except (OSError, struct.error, zlib.error, ValueError):
+        return None
+    if len(levels) != line_count:
+        return None
+    return styles, levels
+
+def write_snapshot(filename, key, styles, fold_levels):
+    """
+    Store a snapshot for `filename`; written to a temporary file first so a
+    reader never sees half of one. Errors are ignored, the cache is optional.
+    """
+    packed_styles = zlib.compress(styles, 1)
+    packed_levels = zlib.compress(array("I", fold_levels).tobytes(), 1)
+    path = snapshot_path(filename)
+    try:
+        with open(path + ".tmp", "wb") as f:
+            f.write(MAGIC)
+            f.write(HEADER.pack(key, len(fold_levels), len(packed_styles), len(packed_levels)))
+            f.write(packed_styles)
+            f.write(packed_levels)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
@@ -0,0 +1,22 @@
+# conftest.py
+
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+
+@pytest.fixture(scope="session")
+def app():
+    return QApplication.instance() or QApplication([])
+
+@pytest.fixture
+def editor(app):
+    from semantic_editor import SemanticEditor
+    editor = SemanticEditor()
+    yield editor
+    editor.deleteLater()
@@ -0,0 +1,19 @@
+# test_export.py
+
+import io
+
+from core_lexer import LineType
+from export import code_span, export_markdown
+
+def test_code_span_outlasts_backticks():
+    assert code_span("main.py") == "`main.py`"
+    assert code_span("a`b") == "``a`b``"
+    assert code_span("x ``` y") == "````x ``` y````"
+    # Padding keeps a leading or trailing backtick off the delimiter
+    assert code_span("`cmd`") == "`` `cmd` ``"
+
+def test_annotation_heading_with_backticks():
+    rows = [(LineType.FILE_ANNOTATION, "  odd`name.py  "), (LineType.CODE, "x = 1")]
+    out = io.StringIO()
+    export_markdown(rows, "Python", out)
+    assert out.getvalue().startswith("#### ``odd`name.py``\n\n")
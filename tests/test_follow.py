@@ -0,0 +1,27 @@
+# test_follow.py
+
+import time
+
+from core_lexer import LineType
+from follow import TraceFollower
+
+def test_parse_line_stream_row():
+    assert TraceFollower.parse_line(b'[2, 0, "main.py"]') == (LineType.FILE_ANNOTATION, "main.py")
+
+def test_parse_line_other_arrays_are_text():
+    for raw in (b"[1, 2, 3]", b"[0, 0, null]", b"[7, 0, \"x\"]", b"[0, 0]", b"[broken"):
+        assert TraceFollower.parse_line(raw) == (LineType.CODE, raw.decode())
+
+def test_follow_appends_malformed_rows(app, editor, tmp_path):
+    trace = tmp_path / "stream.jsonl"
+    trace.write_text('[2, 0, "main.py"]\n[1, 2, 3]\n[0, 0, null]\n[0, 1, "x = 1"]\n')
+    follower = TraceFollower(editor)
+    follower.start(str(trace))
+    deadline = time.monotonic() + 5
+    while editor.lines() < 4 and time.monotonic() < deadline:
+        app.processEvents()
+    follower.stop()
+    assert [editor.text(line).rstrip("\n") for line in range(4)] == \
+        ["main.py", "[1, 2, 3]", "[0, 0, null]", "x = 1"]
+    assert [rd.line_type for rd in editor.row_data] == \
+        [LineType.FILE_ANNOTATION, LineType.CODE, LineType.CODE, LineType.CODE]
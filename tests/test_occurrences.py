@@ -0,0 +1,27 @@
+# test_occurrences.py
+
+from collections import Counter
+
+from lexers import lexer_for
+from occurrences import OccurrenceIndex
+
+def held_tuples(index):
+    return Counter(names for names in index.row_names if names)
+
+def test_tuples_leave_with_their_last_row(app, editor):
+    editor.setLexer(lexer_for("Python", editor))
+    editor.setText("alpha = beta\nalpha = beta\ngamma = 1\n")
+    app.processEvents()
+    index = OccurrenceIndex(editor)
+    editor.rowsChanged.connect(index.apply_delta)
+    index.sync()
+    index.fill_slice(1000)
+    assert held_tuples(index) == {("alpha", "beta"): 2, ("gamma",): 1}
+
+    for line, text in ((2, "delta = 2"), (0, "epsilon"), (1, "zeta")):
+        editor.setSelection(line, 0, line, len(editor.text(line).rstrip("\n")))
+        editor.replaceSelectedText(text)
+        editor.flush_row_deltas()
+    assert index.tuple_rows == held_tuples(index) == {("zeta",): 1, ("epsilon",): 1, ("delta",): 1}
+    assert set(index.name_tuples) == set(index.tuple_rows)
+    assert index.rows_using("alpha") == 0
@@ -0,0 +1,37 @@
+# test_outline.py
+
+from core_lexer import LineType
+from lexers import lexer_for
+from outline import OutlineEntry, OutlineIndex, OutlinePane
+
+def outline(editor):
+    index = OutlineIndex(editor)
+    index.rebuild()
+    return [(e.line, e.kind, e.label) for e in index.entries]
+
+def test_headers_follow_brace_depth(app, editor):
+    editor.setLexer(lexer_for("C++", editor))
+    editor.setText("int x;\n    // indented\n    int g() {\n    return 1;\n    }\n")
+    editor.update_row_data()
+    # Braces, not indentation, decide the headers
+    assert outline(editor) == [(2, OutlineEntry.HEADER, "int g() {")]
+
+def test_text_rows_are_not_headers(app, editor):
+    editor.setText("main.py\nnote\n    more\ndef f():\n    pass\n")
+    editor.set_line_type(0, LineType.FILE_ANNOTATION)
+    editor.set_line_types(1, 2, LineType.TEXT)
+    assert outline(editor) == [(0, OutlineEntry.FILE, "main.py"),
+                               (3, OutlineEntry.HEADER, "def f():")]
+
+def test_pane_follows_carried_brace_depths(app, editor):
+    editor.setLexer(lexer_for("C++", editor))
+    editor.setText("int f() {\nx;\n}\nint g() {\ny;\n}\n")
+    editor.update_row_data()
+    pane = OutlinePane(editor)
+    assert [e.line for e in pane.index.entries] == [0, 3]
+    # An unmatched opener puts every later row inside f()
+    editor.insertAt("{", 1, 0)
+    app.processEvents()
+    assert [e.line for e in pane.index.entries] == [0]
+    assert outline(editor) == [(0, OutlineEntry.HEADER, "int f() {")]
+    pane.deleteLater()
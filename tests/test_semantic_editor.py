@@ -0,0 +1,82 @@
+# test_semantic_editor.py
+
+from PyQt5.Qsci import QsciScintilla
+
+from core_lexer import LineType
+
+def line_types(editor):
+    return [rd.line_type for rd in editor.row_data]
+
+def delete_range(editor, start, end):
+    editor.SendScintilla(QsciScintilla.SCI_DELETERANGE, start, end - start)
+
+def test_undo_deleted_annotation_row(app, editor):
+    editor.setText("a = 1\nmain.py\nnote\nb = 2\n")
+    editor.set_line_type(1, LineType.FILE_ANNOTATION)
+    editor.set_line_type(2, LineType.TEXT)
+    types = line_types(editor)
+
+    # Whole rows
+    delete_range(editor, editor.positionFromLineIndex(1, 0), editor.positionFromLineIndex(3, 0))
+    assert line_types(editor) == [LineType.CODE, LineType.CODE, LineType.CODE]
+    editor.undo()
+    assert line_types(editor) == types
+    editor.redo()
+    editor.undo()
+    assert line_types(editor) == types
+
+    # From the middle of a row into the next ones
+    delete_range(editor, editor.positionFromLineIndex(0, 3), editor.positionFromLineIndex(2, 2))
+    assert len(editor.row_data) == 3
+    editor.undo()
+    assert line_types(editor) == types
+    assert editor.text() == "a = 1\nmain.py\nnote\nb = 2\n"
+
+def test_undo_records_follow_the_history(app, editor):
+    editor.setText("a\nb\nc\n")
+    editor.set_line_type(0, LineType.TEXT)
+    editor.set_line_type(1, LineType.TEXT)
+    assert len(editor.line_type_changes) == 2
+
+    # An undone change is dropped once a new edit discards the redo history
+    editor.undo()
+    editor.setCursorPosition(2, 0)
+    editor.insert("x")
+    assert len(editor.line_type_changes) == 1
+    assert not editor.undone_line_type_changes
+
+    delete_range(editor, 0, editor.positionFromLineIndex(1, 0))
+    assert editor.deleted_line_types
+    editor.setText("new\n")
+    assert not editor.line_type_changes and not editor.deleted_line_types
+
+    editor.set_line_type(0, LineType.TEXT)
+    editor.clear()
+    assert not editor.line_type_changes
+
+def test_matching_brace_in_a_large_region(app, editor):
+    from lexers import lexer_for
+    editor.setLexer(lexer_for("C++", editor))
+    body = ["    if (x) {", "        y(); } else { z();", "    }"] * 20000
+    editor.setText("\n".join(["int f() {"] + body + ["}", "main.cpp", "}"]))
+    editor.set_line_type(len(body) + 2, LineType.FILE_ANNOTATION)
+    editor.update_row_data()
+    last = len(body) + 1
+
+    assert editor.matching_brace(0, 8) == (last, 0)
+    assert editor.matching_brace(last, 0) == (0, 8)
+    # Mid-row closers and openers pair with their neighbours in the row
+    assert editor.matching_brace(2, 13) == (1, 11)
+    assert editor.matching_brace(2, 20) == (3, 4)
+    # Never across a file annotation; a closer at depth 0 pairs with nothing
+    assert editor.matching_brace(last + 2, 0) is None
+    # The cursor path gives up past MATCH_ROWS rows
+    assert editor.matching_brace(0, 8, max_rows=1000) is editor.TOO_FAR
+    assert editor.matching_brace(2, 13, max_rows=1000) == (1, 11)
+
+    # An extra opener takes the outer closer, leaving the first opener
+    # with nothing down to the end of its region
+    editor.insertAt("{", 1, 0)
+    editor.update_row_data()
+    assert editor.matching_brace(1, 0) == (last, 0)
+    assert editor.matching_brace(0, 8) is None
@@ -0,0 +1,49 @@
+# test_tracer.py
+
+import json
+import runpy
+import sys
+
+import pytest
+
+from tracer import ExecutionTracer
+
+SCRIPT = """\
+def inner(n):
+    for i in range(n):
+        if i:
+            pass
+def outer():
+    inner(2)
+outer()
+"""
+
+BACKENDS = [False, pytest.param(True, marks=pytest.mark.skipif(
+    not hasattr(sys, "monitoring"), reason="sys.monitoring needs Python 3.12+"))]
+
+def trace_rows(tmp_path, use_monitoring, runs=1):
+    script = tmp_path / "script.py"
+    script.write_text(SCRIPT)
+    output = tmp_path / "out.trace"
+    tracer = ExecutionTracer(str(output), include=[str(tmp_path)], use_monitoring=use_monitoring)
+    for _ in range(runs):
+        with tracer:
+            runpy.run_path(str(script))
+    trace = json.loads(output.read_text())
+    return [(row["line_type"], row["tabs"], text)
+            for row, text in zip(trace["row_data"], trace["text"].split("\n"))]
+
+@pytest.mark.parametrize("use_monitoring", BACKENDS)
+def test_rows(tmp_path, use_monitoring):
+    rows = trace_rows(tmp_path, use_monitoring)
+    assert rows[0] == (2, 0, str(tmp_path / "script.py"))
+    code = [text for _, _, text in rows[1:]]
+    assert code[:4] == ["def inner(n):", "def outer():", "outer()", "        inner(2)"]
+    assert "                    pass" in code
+    # Tabs are indentation levels: call depth plus nesting in the function
+    for line_type, tabs, text in rows[1:]:
+        assert tabs == (len(text) - len(text.lstrip(" "))) // 4
+
+@pytest.mark.parametrize("use_monitoring", BACKENDS)
+def test_restart(tmp_path, use_monitoring):
+    assert trace_rows(tmp_path, use_monitoring, runs=2) == trace_rows(tmp_path, use_monitoring)
@@ -1,4 +1,5 @@
 from PyQt5.QtGui import QColor, QFont
+from perf import timed
 
 class Theme:
     def __init__(self):
@@ -7,7 +8,18 @@ class Theme:
         self.window_fg = QColor()
         self.menu_bg = QColor()
         self.menu_fg = QColor()
+        # Line backgrounds in the diff view
+        self.diff_delete_bg = QColor()
+        self.diff_insert_bg = QColor()
+        self.diff_replace_bg = QColor()
+        # Indicator behind each occurrence of the identifier at the cursor
+        self.occurrence_bg = QColor()
+        # Background of the current row in playback mode
+        self.playback_bg = QColor()
+        # Translucent box over the part of the minimap on screen
+        self.minimap_viewport = QColor()
 
+    @timed()
     def apply(self, lexer):
         lexer.setDefaultColor(self.styles["code_default"]["color"])
         lexer.setDefaultPaper(self.styles["code_default"]["paper"])
@@ -59,6 +71,12 @@ class LightTheme(Theme):
         self.window_fg = QColor("#000000")
         self.menu_bg = QColor("#F0F0F0")
         self.menu_fg = QColor("#000000")
+        self.diff_delete_bg = QColor("#FFD7D7")
+        self.diff_insert_bg = QColor("#D7F5D7")
+        self.diff_replace_bg = QColor("#FFF3C4")
+        self.occurrence_bg = QColor("#9CC4F0")
+        self.playback_bg = QColor("#FFE08A")
+        self.minimap_viewport = QColor(0, 0, 0, 40)
         self.styles = {
             "code_default": {
                 "color": QColor("#000000"),
@@ -123,6 +141,12 @@ class DarkTheme(Theme):
         self.window_fg = QColor("#FFFFFF")
         self.menu_bg = QColor("#2D2D2D")
         self.menu_fg = QColor("#FFFFFF")
+        self.diff_delete_bg = QColor("#4B1E1E")
+        self.diff_insert_bg = QColor("#1E3F24")
+        self.diff_replace_bg = QColor("#3F3A1E")
+        self.occurrence_bg = QColor("#3A6EA5")
+        self.playback_bg = QColor("#5C4A12")
+        self.minimap_viewport = QColor(255, 255, 255, 48)
         self.styles = {
             "code_default": {
                 "color": QColor("#FFFFFF"),
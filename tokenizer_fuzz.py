@@ -0,0 +1,141 @@
+# tokenizer_fuzz.py
+
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import random
+import sys
+import time
+
+from PyQt5.QtWidgets import QApplication
+
+from languages import LANGUAGES
+
+# Lines built to make a backtracking tokenizer rescan the rest of the line
+# from every position, plus very long but ordinary ones. Each takes the
+# line length to generate.
+ADVERSARIAL = {
+    "escaped_quotes": lambda n: 'x"' + '\\"' * (n // 2),
+    "escaped_apostrophes": lambda n: "x'" + "\\'" * (n // 2),
+    "backslashes": lambda n: '"' + "\\" * n,
+    "quote_storm": lambda n: "'\\'" * (n // 3),
+    "unclosed_comments": lambda n: "/* " * (n // 3),
+    "comment_stars": lambda n: "/*" + "*" * n,
+    "hash_comment": lambda n: "#" * n,
+    "slashes": lambda n: "/" * n,
+    "identifier": lambda n: "a" * n,
+    "number": lambda n: "1." * (n // 2),
+    "braces": lambda n: "{}" * (n // 2),
+    "minified": lambda n: ('f(a,"b",{c:1});' * (n // 15 + 1))[:n],
+    "unicode": lambda n: ("é\"ü'{/*" * (n // 7 + 1))[:n],
+}
+
+# Characters that start or end tokens in one of the languages
+FUZZ_ALPHABET = "\"'\\/*#{}()[];,.= \ta_Z09é"
+
+def fuzz_lines(count, max_length, seed):
+    rng = random.Random(seed)
+    for _ in range(count):
+        length = int(max_length ** rng.random())
+        yield "".join(rng.choice(FUZZ_ALPHABET) for _ in range(length))
+
+def check_runs(runs, text):
+    """
+    Runs must be non-empty, in order and cover the whole line.
+    """
+    position = 0
+    for start, end, style in runs:
+        if start != position or end <= start:
+            return False
+        position = end
+    return position == len(text)
+
+def time_line(lexer, editor, text):
+    """
+    Milliseconds to tokenize and find the braces of `text`, and to style it
+    as a line of `editor`.
+    """
+    start = time.perf_counter()
+    runs = lexer.scan_runs(text)
+    lexer.code_braces(text)
+    tokenize_ms = (time.perf_counter() - start) * 1000
+    if not check_runs(runs, text):
+        raise AssertionError(f"{lexer.language()}: bad runs for {text[:40]!r}...")
+
+    editor.row_data.clear()
+    editor.setText(text)
+    editor.init_row_data()
+    lexer.recent_runs.clear()
+    start = time.perf_counter()
+    lexer.style_lines(0, 0)
+    style_ms = (time.perf_counter() - start) * 1000
+    return tokenize_ms, style_ms
+
+def scan_ms(lexer, text):
+    start = time.perf_counter()
+    for _ in lexer.TOKEN_REGEX.finditer(text):
+        pass
+    return (time.perf_counter() - start) * 1000
+
+def check_scaling(lexer, name, make, length):
+    """
+    Ratio of TOKEN_REGEX scan times over a line 4x as long, without the
+    LONG_LINE cap: about 4 for a linear scan, 16 for a quadratic one.
+    """
+    short, long = make(length // 4), make(length)
+    scan_ms(lexer, short)
+    short_ms = min(scan_ms(lexer, short) for _ in range(3))
+    long_ms = min(scan_ms(lexer, long) for _ in range(3))
+    return long_ms / max(short_ms, 0.05)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Feed adversarial and very long lines to the lexers and check the per-line time.")
+    parser.add_argument("--languages", nargs="+", default=list(LANGUAGES), choices=list(LANGUAGES))
+    parser.add_argument("--length", type=int, default=1000000, help="longest line, in characters")
+    parser.add_argument("--fuzz", type=int, default=300, help="number of random lines")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--budget", type=float, default=50.0, help="allowed ms per line")
+    parser.add_argument("--scaling-length", type=int, default=200000,
+                        help="line length for the uncapped linear-time check")
+    parser.add_argument("--max-ratio", type=float, default=8.0,
+                        help="allowed scan time ratio for a 4x longer line")
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    from lexers import lexer_for
+    from semantic_editor import SemanticEditor
+
+    failures = []
+    for language in args.languages:
+        editor = SemanticEditor()
+        lexer = lexer_for(language, editor)
+        editor.setLexer(lexer)
+
+        cases = [(name, make(args.length)) for name, make in ADVERSARIAL.items()]
+        cases += [(f"fuzz_{i}", line) for i, line in enumerate(fuzz_lines(args.fuzz, args.length, args.seed))]
+        worst = (0.0, None)
+        for name, text in cases:
+            tokenize_ms, style_ms = time_line(lexer, editor, text)
+            line_ms = tokenize_ms + style_ms
+            worst = max(worst, (line_ms, name))
+            if line_ms > args.budget:
+                failures.append(f"{language} {name} ({len(text)} chars): {line_ms:.1f} ms")
+        print(f"{language:7} {len(cases):5} lines  worst {worst[0]:8.2f} ms ({worst[1]})")
+
+        for name, make in ADVERSARIAL.items():
+            ratio = check_scaling(lexer, name, make, args.scaling_length)
+            if ratio > args.max_ratio:
+                failures.append(f"{language} {name}: scan time x{ratio:.1f} for a 4x longer line")
+
+        editor.deleteLater()
+        app.processEvents()
+
+    for failure in failures:
+        print(f"OVER BUDGET {failure}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+# trace_archive.py
+
+import argparse
+import json
+import lzma
+import os
+import re
+import struct
+import sys
+import time
+import zlib
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+# A .tracez archive holds the same document as a .trace file, cut into
+# chunks of rows that are compressed independently: reading a range of rows
+# only unpacks the chunks it touches, and chunks unpack in parallel (zlib
+# and lzma release the GIL). Layout:
+#
+#   MAGIC, HEADER, settings JSON (tab_size, language, theme, word_wrap,
+#   codec, line_count), one CHUNK entry per chunk, then the packed chunks.
+#
+# A chunk unpacks to the line type of each of its rows (one byte each),
+# their tabs (array "I") and their text (UTF-8, separated by "\n").
+MAGIC = b"CTARCH1\n"
+HEADER = struct.Struct("<II")   # settings size, chunk count
+CHUNK = struct.Struct("<IIQI")  # first row, row count, file offset, packed size
+CHUNK_ROWS = 16384
+CODECS = {
+    "zlib": (partial(zlib.compress, level=6), zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+SETTINGS = ("tab_size", "language", "theme", "word_wrap")
+
+def is_archive(filename):
+    try:
+        with open(filename, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def pack_chunk(compress, line_types, tabs, lines):
+    return compress(bytes(line_types) + array("I", tabs).tobytes() + "\n".join(lines).encode("utf-8"))
+
+def write_archive(filename, data, codec="zlib", chunk_rows=CHUNK_ROWS, workers=None):
+    """
+    Write `data`, a document as a .trace file holds it, as an archive. The
+    chunks are compressed on `workers` threads; like write_snapshot(), the
+    archive goes to a temporary file first.
+    """
+    lines = data.get("text", "").split("\n")
+    row_data = data.get("row_data", [])[:len(lines)]
+    missing = len(lines) - len(row_data)
+    line_types = bytes(rd.get("line_type", 0) for rd in row_data) + bytes(missing)
+    tabs = array("I", (rd.get("tabs", 0) for rd in row_data)) + array("I", bytes(4 * missing))
+
+    compress = CODECS[codec][0]
+    starts = range(0, len(lines), chunk_rows)
+    with ThreadPoolExecutor(workers) as pool:
+        packed = list(pool.map(lambda start: pack_chunk(compress, line_types[start:start + chunk_rows],
+                                                        tabs[start:start + chunk_rows],
+                                                        lines[start:start + chunk_rows]), starts))
+
+    settings = {key: data[key] for key in SETTINGS if key in data}
+    settings.update(codec=codec, line_count=len(lines))
+    settings = json.dumps(settings).encode("utf-8")
+    offset = len(MAGIC) + HEADER.size + len(settings) + CHUNK.size * len(packed)
+    index = []
+    for start, chunk in zip(starts, packed):
+        index.append(CHUNK.pack(start, min(chunk_rows, len(lines) - start), offset, len(chunk)))
+        offset += len(chunk)
+
+    with open(filename + ".tmp", "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(len(settings), len(packed)))
+        f.write(settings)
+        f.writelines(index)
+        f.writelines(packed)
+    os.replace(filename + ".tmp", filename)
+
+
+class TraceArchive:
+    """
+    Random access to the rows of a .tracez archive. Only the header and the
+    chunk index are read when it is opened.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{filename} is not a trace archive")
+            settings_size, chunk_count = HEADER.unpack(f.read(HEADER.size))
+            self.settings = json.loads(f.read(settings_size))
+            self.chunks = list(CHUNK.iter_unpack(f.read(CHUNK.size * chunk_count)))
+        self.first_rows = [chunk[0] for chunk in self.chunks]
+        self.line_count = self.settings["line_count"]
+        self.decompress = CODECS[self.settings["codec"]][1]
+
+    def read_chunk(self, i):
+        """
+        (line types, tabs, lines) of the rows of chunk i.
+        """
+        _, count, offset, size = self.chunks[i]
+        with open(self.filename, "rb") as f:
+            f.seek(offset)
+            raw = self.decompress(f.read(size))
+        tabs = array("I")
+        tabs.frombytes(raw[count:5 * count])
+        return raw[:count], tabs, raw[5 * count:].decode("utf-8").split("\n")
+
+    def chunks_for(self, first, last):
+        """
+        Indexes of the chunks holding rows [first, last).
+        """
+        if last <= first:
+            return range(0)
+        return range(bisect_right(self.first_rows, first) - 1, bisect_right(self.first_rows, last - 1))
+
+    def read_rows(self, first=0, last=None, workers=None):
+        """
+        (line types, tabs, lines) of rows [first, last), unpacking only the
+        chunks that hold them.
+        """
+        last = self.line_count if last is None else min(last, self.line_count)
+        first = max(0, min(first, last))
+        chunks = self.chunks_for(first, last)
+        line_types = bytearray()
+        tabs = array("I")
+        lines = []
+        with ThreadPoolExecutor(workers) as pool:
+            for chunk_types, chunk_tabs, chunk_lines in pool.map(self.read_chunk, chunks):
+                line_types += chunk_types
+                tabs += chunk_tabs
+                lines += chunk_lines
+        skip = self.first_rows[chunks[0]] if chunks else 0
+        return (bytes(line_types[first - skip:last - skip]), tabs[first - skip:last - skip],
+                lines[first - skip:last - skip])
+
+    def trace_data(self, first=0, last=None):
+        """
+        Rows [first, last) as a document dict in the shape of a .trace file.
+        """
+        line_types, tabs, lines = self.read_rows(first, last)
+        data = {key: self.settings[key] for key in SETTINGS if key in self.settings}
+        data["row_data"] = [{"tabs": t, "line_type": line_type} for line_type, t in zip(line_types, tabs)]
+        data["text"] = "\n".join(lines)
+        return data
+
+
+def read_trace_data(filename):
+    """
+    The document dict of a .trace file or a .tracez archive.
+    """
+    if is_archive(filename):
+        return TraceArchive(filename).trace_data()
+    with open(filename, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def scan_chunk(filename, i, scanner):
+    archive = TraceArchive(filename)
+    return scanner(archive.first_rows[i], *archive.read_chunk(i))
+
+def scan_archives(filenames, scanner, workers=None):
+    """
+    Run scanner(first row, line types, tabs, lines) on every chunk of every
+    archive, spread over `workers` processes. `scanner` must be picklable
+    (a module-level function or a partial of one). Yields (filename, list
+    of results in chunk order).
+    """
+    with ProcessPoolExecutor(workers) as pool:
+        pending = []
+        for filename in filenames:
+            chunk_count = len(TraceArchive(filename).chunks)
+            pending.append((filename, [pool.submit(scan_chunk, filename, i, scanner)
+                                       for i in range(chunk_count)]))
+        for filename, futures in pending:
+            yield filename, [future.result() for future in futures]
+
+def grep_chunk(pattern, line_type, first, line_types, tabs, lines):
+    """
+    (row, text) of the chunk's rows matching `pattern`, of `line_type` only
+    unless it is None.
+    """
+    search = re.compile(pattern).search
+    return [(first + i, text) for i, text in enumerate(lines)
+            if (line_type is None or line_types[i] == line_type) and search(text)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack .trace files into chunked archives and scan them.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pack = commands.add_parser("pack", help="write a .trace file as a .tracez archive")
+    pack.add_argument("trace")
+    pack.add_argument("-o", "--output", help="default: the trace name with .tracez")
+    pack.add_argument("--codec", choices=list(CODECS), default="zlib")
+    pack.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+
+    unpack = commands.add_parser("unpack", help="write rows of an archive as a .trace file")
+    unpack.add_argument("archive")
+    unpack.add_argument("-o", "--output", help="default: the archive name with .trace")
+    unpack.add_argument("--first", type=int, default=1, help="first row, from 1")
+    unpack.add_argument("--count", type=int, help="number of rows (default: all)")
+
+    info = commands.add_parser("info", help="show archive settings and sizes")
+    info.add_argument("archives", nargs="+")
+
+    grep = commands.add_parser("grep", help="print the rows matching a regular expression")
+    grep.add_argument("pattern")
+    grep.add_argument("archives", nargs="+")
+    grep.add_argument("--line-type", type=int, choices=[0, 1, 2], help="0 code, 1 text, 2 file annotation")
+    grep.add_argument("--workers", type=int, help="processes (default: one per core)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "pack":
+        output = args.output or os.path.splitext(args.trace)[0] + ".tracez"
+        with open(args.trace, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        write_archive(output, data, args.codec, args.chunk_rows)
+        print(f"{os.path.getsize(args.trace)} -> {os.path.getsize(output)} bytes in "
+              f"{time.perf_counter() - start:.2f} s: {output}", file=sys.stderr)
+    elif args.command == "unpack":
+        output = args.output or os.path.splitext(args.archive)[0] + ".trace"
+        first = args.first - 1
+        last = first + args.count if args.count is not None else None
+        data = TraceArchive(args.archive).trace_data(first, last)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        print(f"{len(data['row_data'])} rows written to {output}", file=sys.stderr)
+    elif args.command == "info":
+        for filename in args.archives:
+            archive = TraceArchive(filename)
+            print(f"{filename}: {archive.line_count} rows, {len(archive.chunks)} "
+                  f"{archive.settings['codec']} chunks, {os.path.getsize(filename)} bytes, "
+                  f"{archive.settings.get('language', '?')}")
+    else:
+        scanner = partial(grep_chunk, args.pattern, args.line_type)
+        matches = 0
+        for filename, results in scan_archives(args.archives, scanner, args.workers):
+            prefix = f"{filename}:" if len(args.archives) > 1 else ""
+            for rows in results:
+                for row, text in rows:
+                    print(f"{prefix}{row + 1}:{text}")
+                matches += len(rows)
+        print(f"{matches} matching rows in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# trace_diff.py
+
+import argparse
+import sys
+import time
+from bisect import bisect_left
+
+from trace_archive import read_trace_data
+
+# Bisections that have not met in the middle after this many edit steps
+# split at their furthest-reaching forward path instead (GNU diff's
+# heuristic), so very different traces stay near-linear at the cost of a
+# slightly longer script.
+MAX_EDIT_COST = 256
+
+EQUAL = "equal"
+DELETE = "delete"
+INSERT = "insert"
+REPLACE = "replace"
+
+def read_trace_rows(filename):
+    """
+    (line_type, tabs, text) rows of a .trace file or archive.
+    """
+    data = read_trace_data(filename)
+    lines = data.get("text", "").split("\n")
+    row_data = data.get("row_data", [])
+    rows = []
+    for i, text in enumerate(lines):
+        rd = row_data[i] if i < len(row_data) else {}
+        rows.append((rd.get("line_type", 0), rd.get("tabs", 0), text))
+    return data, rows
+
+def intern_rows(rows_a, rows_b):
+    """
+    Map every distinct (line_type, text) to a small integer, so the diff
+    compares ints and a TEXT note never matches identical CODE.
+    """
+    ids = {}
+    def ids_for(rows):
+        return [ids.setdefault((line_type, text), len(ids)) for line_type, _, text in rows]
+    return ids_for(rows_a), ids_for(rows_b)
+
+def middle_snake(a, a0, a1, b, b0, b1):
+    """
+    Split point (x, y) of a shortest edit script between a[a0:a1] and
+    b[b0:b1], found by running Myers' search from both ends at once in
+    O(len) space. None if the ranges share nothing worth splitting on.
+    """
+    n = a1 - a0
+    m = b1 - b0
+    max_d = (n + m + 1) // 2
+    offset = max_d + 1
+    size = 2 * offset + 1
+    forward = [-1] * size
+    backward = [-1] * size
+    forward[offset + 1] = 0
+    backward[offset + 1] = 0
+    delta = n - m
+    front = delta % 2 != 0
+    # Diagonals that ran off the edge of the grid are skipped from then on
+    k1_start = k1_end = k2_start = k2_end = 0
+
+    for d in range(max_d):
+        if d > MAX_EDIT_COST:
+            best_x, best_k = -1, 0
+            for k in range(-d + 1 + k1_start, d - k1_end, 2):
+                x = forward[offset + k]
+                if 0 <= x <= n and x - k <= m and 2 * x - k > 2 * best_x - best_k:
+                    best_x, best_k = x, k
+            if 0 < 2 * best_x - best_k < n + m:
+                return a0 + best_x, b0 + best_x - best_k
+            return None
+
+        for k1 in range(-d + k1_start, d + 1 - k1_end, 2):
+            k1_offset = offset + k1
+            if k1 == -d or (k1 != d and forward[k1_offset - 1] < forward[k1_offset + 1]):
+                x1 = forward[k1_offset + 1]
+            else:
+                x1 = forward[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[a0 + x1] == b[b0 + y1]:
+                x1 += 1
+                y1 += 1
+            forward[k1_offset] = x1
+            if x1 > n:
+                k1_end += 2
+            elif y1 > m:
+                k1_start += 2
+            elif front:
+                k2_offset = offset + delta - k1
+                if 0 <= k2_offset < size and backward[k2_offset] != -1:
+                    if x1 >= n - backward[k2_offset]:
+                        return a0 + x1, b0 + y1
+
+        for k2 in range(-d + k2_start, d + 1 - k2_end, 2):
+            k2_offset = offset + k2
+            if k2 == -d or (k2 != d and backward[k2_offset - 1] < backward[k2_offset + 1]):
+                x2 = backward[k2_offset + 1]
+            else:
+                x2 = backward[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[a1 - x2 - 1] == b[b1 - y2 - 1]:
+                x2 += 1
+                y2 += 1
+            backward[k2_offset] = x2
+            if x2 > n:
+                k2_end += 2
+            elif y2 > m:
+                k2_start += 2
+            elif not front:
+                k1_offset = offset + delta - k2
+                if 0 <= k1_offset < size and forward[k1_offset] != -1:
+                    x1 = forward[k1_offset]
+                    y1 = x1 - (k1_offset - offset)
+                    if x1 >= n - x2:
+                        return a0 + x1, b0 + y1
+    return None
+
+def unique_anchors(a, b):
+    """
+    (i, j) pairs of items that occur exactly once in each sequence, reduced
+    to the longest chain increasing on both sides (patience diff). They cut
+    the search into independent gaps, so a long inserted block between two
+    anchors never has to be crossed by the bounded Myers search.
+    """
+    position_a = {}
+    for i, item in enumerate(a):
+        position_a[item] = -1 if item in position_a else i
+    position_b = {}
+    for j, item in enumerate(b):
+        position_b[item] = -1 if item in position_b else j
+    # position_a keeps first-occurrence order, so the pairs are sorted by i
+    pairs = []
+    for item, i in position_a.items():
+        j = position_b.get(item, -1)
+        if i >= 0 and j >= 0:
+            pairs.append((i, j))
+
+    tails = []        # smallest last j of an increasing chain of each length
+    tail_pairs = []
+    previous = [-1] * len(pairs)
+    for n, (_, j) in enumerate(pairs):
+        length = bisect_left(tails, j)
+        if length == len(tails):
+            tails.append(j)
+            tail_pairs.append(n)
+        else:
+            tails[length] = j
+            tail_pairs[length] = n
+        previous[n] = tail_pairs[length - 1] if length else -1
+
+    chain = []
+    n = tail_pairs[-1] if tail_pairs else -1
+    while n >= 0:
+        chain.append(pairs[n])
+        n = previous[n]
+    chain.reverse()
+    return chain
+
+def common_runs(a, b, gaps):
+    """
+    Sorted (i, j, size) runs of a shortest edit script between a and b
+    within each (a0, a1, b0, b1) gap. Ranges are trimmed of common ends
+    before each bisection.
+    """
+    runs = []
+    stack = list(gaps)
+    while stack:
+        a0, a1, b0, b1 = stack.pop()
+        start_a, start_b = a0, b0
+        while a0 < a1 and b0 < b1 and a[a0] == b[b0]:
+            a0 += 1
+            b0 += 1
+        if a0 > start_a:
+            runs.append((start_a, start_b, a0 - start_a))
+        end_a, end_b = a1, b1
+        while a1 > a0 and b1 > b0 and a[a1 - 1] == b[b1 - 1]:
+            a1 -= 1
+            b1 -= 1
+        if a1 < end_a:
+            runs.append((a1, b1, end_a - a1))
+        if a0 == a1 or b0 == b1:
+            continue
+        split = middle_snake(a, a0, a1, b, b0, b1)
+        if split is None:
+            continue
+        x, y = split
+        stack.append((x, a1, y, b1))
+        stack.append((a0, x, b0, y))
+    return runs
+
+def matching_blocks(a, b):
+    """
+    (i, j, size) runs of equal items in order, ending with (len(a), len(b), 0)
+    like difflib.
+    """
+    # Rows that occur on one side only can never match. Leaving them out
+    # before the search (as GNU diff does) keeps diverging traces cheap.
+    in_a, in_b = set(a), set(b)
+    kept_a = [i for i, item in enumerate(a) if item in in_b]
+    kept_b = [j for j, item in enumerate(b) if item in in_a]
+    reduced_a = [a[i] for i in kept_a]
+    reduced_b = [b[j] for j in kept_b]
+
+    gaps = []
+    anchor_runs = []
+    next_a = next_b = 0
+    for i, j in unique_anchors(reduced_a, reduced_b):
+        gaps.append((next_a, i, next_b, j))
+        anchor_runs.append((i, j, 1))
+        next_a, next_b = i + 1, j + 1
+    gaps.append((next_a, len(reduced_a), next_b, len(reduced_b)))
+    runs = sorted(common_runs(reduced_a, reduced_b, gaps) + anchor_runs)
+
+    blocks = []
+    def add(i, j, size):
+        if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+            blocks[-1] = (blocks[-1][0], blocks[-1][1], blocks[-1][2] + size)
+        else:
+            blocks.append((i, j, size))
+
+    for i, j, size in runs:
+        first_a, first_b = kept_a[i], kept_b[j]
+        if kept_a[i + size - 1] - first_a == size - 1 and kept_b[j + size - 1] - first_b == size - 1:
+            add(first_a, first_b, size)
+        else:
+            # The run straddles left-out rows; map it back item by item
+            for offset in range(size):
+                add(kept_a[i + offset], kept_b[j + offset], 1)
+    blocks.append((len(a), len(b), 0))
+    return blocks
+
+def diff_opcodes(a, b):
+    """
+    difflib-style (tag, a0, a1, b0, b1) opcodes covering both sequences.
+    """
+    opcodes = []
+    i = j = 0
+    for block_a, block_b, size in matching_blocks(a, b):
+        if i < block_a and j < block_b:
+            opcodes.append((REPLACE, i, block_a, j, block_b))
+        elif i < block_a:
+            opcodes.append((DELETE, i, block_a, j, block_b))
+        elif j < block_b:
+            opcodes.append((INSERT, i, block_a, j, block_b))
+        if size:
+            opcodes.append((EQUAL, block_a, block_a + size, block_b, block_b + size))
+        i, j = block_a + size, block_b + size
+    return opcodes
+
+def diff_rows(rows_a, rows_b):
+    ids_a, ids_b = intern_rows(rows_a, rows_b)
+    return diff_opcodes(ids_a, ids_b)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two .trace files by text and line type.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    _, rows_a = read_trace_rows(args.old)
+    _, rows_b = read_trace_rows(args.new)
+    loaded = time.perf_counter()
+    opcodes = diff_rows(rows_a, rows_b)
+    done = time.perf_counter()
+
+    hunks = [op for op in opcodes if op[0] != EQUAL]
+    removed = sum(a1 - a0 for _, a0, a1, _, _ in hunks)
+    added = sum(b1 - b0 for _, _, _, b0, b1 in hunks)
+    for tag, a0, a1, b0, b1 in hunks:
+        print(f"{tag:7} -{a0 + 1},{a1 - a0} +{b0 + 1},{b1 - b0}")
+    print(f"{len(hunks)} hunks, -{removed} +{added} rows; "
+          f"read {loaded - start:.2f} s, diff {done - loaded:.2f} s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# trace_generator.py
+
+import argparse
+import json
+import random
+
+# Statement templates per language; {name} and {num} are filled at random.
+# Templates ending in a block opener push the indentation one level deeper.
+CODE_TEMPLATES = {
+    "Python": {
+        "statements": [
+            "{name} = {num}",
+            "{name} = {name}({name}, {num})",
+            "return {name} + {num}",
+            "print(\"{name}: %d\" % {name})",
+            "{name}.append('{name}')",
+            "# {name} is recomputed here",
+            "x = {name} if {name} else None",
+        ],
+        "openers": [
+            "def {name}({name}, {name}=None):",
+            "if {name} > {num}:",
+            "for {name} in range({num}):",
+            "while {name}:",
+            "class {Name}:",
+            "with open(\"{name}.txt\") as f:",
+        ],
+        "close": None,
+        "extension": ".py",
+    },
+    "C++": {
+        "statements": [
+            "int {name} = {num};",
+            "{name} = {name}({name}, {num});",
+            "return {name} + {num};",
+            "std::cout << \"{name}: \" << {name} << std::endl;",
+            "{name}.push_back('{name}');",
+            "// {name} is recomputed here",
+            "/* {name} */ auto x = {name} ? {num} : 0;",
+        ],
+        "openers": [
+            "int {name}(int {name}, double {name}) {{",
+            "if ({name} > {num}) {{",
+            "for (int i = 0; i < {num}; ++i) {{",
+            "while ({name}) {{",
+            "class {Name} {{",
+        ],
+        "close": "}}",
+        "extension": ".cpp",
+    },
+    "Java": {
+        "statements": [
+            "int {name} = {num};",
+            "{name} = {name}({name}, {num});",
+            "return {name} + {num};",
+            "System.out.println(\"{name}: \" + {name});",
+            "{name}.add(\"{name}\");",
+            "// {name} is recomputed here",
+            "/* {name} */ boolean x = {name} != null;",
+        ],
+        "openers": [
+            "public int {name}(int {name}, double {name}) {{",
+            "if ({name} > {num}) {{",
+            "for (int i = 0; i < {num}; i++) {{",
+            "while ({name}) {{",
+            "public class {Name} {{",
+        ],
+        "close": "}}",
+        "extension": ".java",
+    },
+}
+
+NOTE_TEMPLATES = [
+    "Here {name} still holds the value from the previous call.",
+    "TODO: check why {name} is {num} at this point",
+    "Note: {name} is only set on the slow path.",
+    "This loop runs {num} times in the failing case.",
+]
+
+NAMES = ["value", "count", "node", "buffer", "result", "index", "total", "item", "cache", "state"]
+
+DEFAULT_MIX = {"code": 0.8, "text": 0.15, "file": 0.05}
+
+def parse_mix(spec):
+    """
+    Parse "code=0.7,text=0.2,file=0.1" into a dict of line-type weights.
+    """
+    mix = dict(DEFAULT_MIX)
+    for part in spec.split(","):
+        if part.strip():
+            key, value = part.split("=")
+            mix[key.strip()] = float(value)
+    return mix
+
+def generate_trace_data(line_count, language="Python", mix=None, tab_size=4, seed=0):
+    """
+    Build a synthetic trace in the same structure MainWindow.do_save writes.
+    Indentation follows a random walk of call depth; FILE_ANNOTATION lines
+    reset it, and TEXT notes come in short runs.
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    templates = CODE_TEMPLATES[language]
+    kinds = ["code", "text", "file"]
+    weights = [mix.get(kind, 0) for kind in kinds]
+
+    def fill(template):
+        name = rng.choice(NAMES)
+        return template.format(name=name, Name=name.capitalize(), num=rng.randint(0, 999))
+
+    lines = []
+    row_data = []
+    depth = 0
+    note_run = 0
+    file_index = 0
+    while len(lines) < line_count:
+        kind = "text" if note_run > 0 else rng.choices(kinds, weights)[0]
+        if kind == "file":
+            file_index += 1
+            lines.append(f"src/module_{file_index}{templates['extension']}")
+            row_data.append({"tabs": 0, "line_type": 2})
+            depth = 0
+            continue
+        if kind == "text":
+            if note_run == 0:
+                note_run = rng.randint(1, 4)
+            note_run -= 1
+            lines.append(" " * (depth * tab_size) + fill(rng.choice(NOTE_TEMPLATES)))
+            row_data.append({"tabs": depth, "line_type": 1})
+            continue
+
+        roll = rng.random()
+        if roll < 0.2 and depth < 12:
+            text = fill(rng.choice(templates["openers"]))
+            next_depth = depth + 1
+        elif roll < 0.35 and depth > 0:
+            depth -= 1
+            text = fill(templates["close"]) if templates["close"] else fill(rng.choice(templates["statements"]))
+            next_depth = depth
+        else:
+            text = fill(rng.choice(templates["statements"]))
+            next_depth = depth
+        lines.append(" " * (depth * tab_size) + text)
+        row_data.append({"tabs": depth, "line_type": 0})
+        depth = next_depth
+
+    return {
+        "tab_size": tab_size,
+        "language": language,
+        "theme": "Dark",
+        "word_wrap": False,
+        "row_data": row_data,
+        "text": "\n".join(lines)
+    }
+
+def write_trace(filename, line_count, language="Python", mix=None, tab_size=4, seed=0):
+    data = generate_trace_data(line_count, language, mix, tab_size, seed)
+    with open(filename, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    return filename
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic .trace file.")
+    parser.add_argument("output")
+    parser.add_argument("--lines", type=int, default=10000)
+    parser.add_argument("--language", choices=sorted(CODE_TEMPLATES), default="Python")
+    parser.add_argument("--mix", default="", help="line-type weights, e.g. code=0.7,text=0.2,file=0.1")
+    parser.add_argument("--tab-size", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_trace(args.output, args.lines, args.language, parse_mix(args.mix), args.tab_size, args.seed)
+
+if __name__ == "__main__":
+    main()
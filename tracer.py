@@ -0,0 +1,377 @@
+# tracer.py
+
+import argparse
+import json
+import linecache
+import os
+import queue
+import runpy
+import shutil
+import sys
+import sysconfig
+import tempfile
+import threading
+import time
+from _thread import get_ident
+
+# LineType values from core_lexer; not imported so tracing never pulls in Qt
+CODE = 0
+FILE_ANNOTATION = 2
+
+class TraceWriter:
+    """
+    Streams rows into a .trace file from a background thread. row_data goes
+    straight to the output while the text is spooled to a temporary file and
+    appended on close, so memory stays flat however long the run is.
+    """
+    def __init__(self, filename, tab_size=4, language="Python"):
+        self.filename = filename
+        self.tab_size = tab_size
+        self.language = language
+        self.batches = queue.SimpleQueue()
+        self.rows_written = 0
+        self.thread = threading.Thread(target=self.run, name="TraceWriter", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def encode_row(line_type, tabs, text):
+        """
+        Serialize one row as its (row_data entry, escaped text) JSON fragments.
+        """
+        return ('{"tabs": %d, "line_type": %d}' % (tabs, line_type),
+                json.dumps(text, ensure_ascii=False)[1:-1])
+
+    def write(self, rows):
+        """
+        Queue a batch of rows produced by encode_row().
+        """
+        self.batches.put(rows)
+
+    def close(self):
+        self.batches.put(None)
+        self.thread.join()
+
+    def run(self):
+        with open(self.filename, "w", encoding="utf-8") as out, \
+                tempfile.TemporaryFile("w+", encoding="utf-8") as spool:
+            out.write(json.dumps({
+                "tab_size": self.tab_size,
+                "language": self.language,
+                "theme": "Dark",
+                "word_wrap": False
+            })[:-1])
+            out.write(', "row_data": [')
+            first = True
+            while True:
+                rows = self.batches.get()
+                if rows is None:
+                    break
+                row_parts, text_parts = zip(*rows)
+                if not first:
+                    out.write(", ")
+                    spool.write("\\n")
+                out.write(", ".join(row_parts))
+                spool.write("\\n".join(text_parts))
+                first = False
+                self.rows_written += len(rows)
+            out.write('], "text": "')
+            spool.seek(0)
+            shutil.copyfileobj(spool, out)
+            out.write('"}')
+
+
+class StreamTraceWriter(TraceWriter):
+    """
+    Writes one [line_type, tabs, "text"] JSON row per line and flushes every
+    batch, so the file can be followed live by the editor while it grows.
+    """
+    @staticmethod
+    def encode_row(line_type, tabs, text):
+        return json.dumps([line_type, tabs, text], ensure_ascii=False)
+
+    def run(self):
+        with open(self.filename, "w", encoding="utf-8") as out:
+            while True:
+                rows = self.batches.get()
+                if rows is None:
+                    break
+                out.write("\n".join(rows))
+                out.write("\n")
+                out.flush()
+                self.rows_written += len(rows)
+
+
+class ExecutionTracer:
+    """
+    Records executed Python lines of the starting thread as a .trace
+    document: a FILE_ANNOTATION row whenever the file changes, then CODE rows
+    indented by call depth, with each line keeping its indentation relative
+    to its function. Uses sys.monitoring on 3.12+, sys.settrace otherwise.
+    Code outside the traced paths (stdlib and site-packages by default) is
+    switched off at its first event so it costs nothing afterwards; with
+    sys.monitoring, LINE events are only ever switched on in traced code.
+    """
+    BATCH_SIZE = 4096
+    TOOL_NAME = "code_trace"
+
+    def __init__(self, filename, tab_size=4, include=None, exclude=None,
+                 max_lines=None, use_monitoring=None, stream=False):
+        self.filename = filename
+        self.writer_class = StreamTraceWriter if stream else TraceWriter
+        self.tab_size = tab_size
+        self.include = tuple(os.path.abspath(p) for p in include or ())
+        self.exclude = tuple(os.path.abspath(p) for p in exclude or ()) + self.default_excludes()
+        self.max_lines = max_lines
+        if use_monitoring is None:
+            use_monitoring = hasattr(sys, "monitoring")
+        self.use_monitoring = use_monitoring
+
+        self.writer = None
+        self.thread_id = None
+        self.tool_id = None
+        self.depth = 0
+        self.line_count = 0
+        self.last_file = None
+        self.batch = []
+        # Per code object, keyed by id(): a code object hashes its name,
+        # bytecode and constants on every dict lookup. traced_code holds the
+        # code object, so its id is not reused while it is cached.
+        self.traced_code = {}  # id(code) -> (code object, bool)
+        self.code_rows = {}    # id(code) -> {(line number, depth): encoded CODE row}
+        self.line_text = {}    # (code object, line number) -> text without call-depth indent
+
+    @staticmethod
+    def default_excludes():
+        paths = sysconfig.get_paths()
+        excludes = {paths[key] for key in ("stdlib", "platstdlib", "purelib", "platlib") if key in paths}
+        excludes.add(os.path.abspath(__file__))
+        excludes.add(os.path.dirname(threading.__file__))
+        return tuple(os.path.abspath(p) for p in excludes)
+
+    def is_traced(self, code):
+        entry = self.traced_code.get(id(code))
+        if entry is not None:
+            return entry[1]
+        filename = code.co_filename
+        if filename.startswith("<"):
+            traced = False
+        else:
+            path = os.path.abspath(filename)
+            if self.include:
+                traced = path.startswith(self.include)
+            else:
+                traced = not path.startswith(self.exclude)
+        self.traced_code[id(code)] = (code, traced)
+        self.code_rows[id(code)] = {}
+        if traced and self.use_monitoring:
+            sys.monitoring.set_local_events(self.tool_id, code, sys.monitoring.events.LINE)
+        return traced
+
+    def source_text(self, code, lineno):
+        """
+        Source line re-indented relative to the line that starts its code object.
+        """
+        key = (code, lineno)
+        text = self.line_text.get(key)
+        if text is None:
+            line = linecache.getline(code.co_filename, lineno).rstrip("\r\n").expandtabs(self.tab_size)
+            first = linecache.getline(code.co_filename, code.co_firstlineno).expandtabs(self.tab_size)
+            base_indent = len(first) - len(first.lstrip(" "))
+            indent = len(line) - len(line.lstrip(" "))
+            if code.co_name == "<module>":
+                base_indent = 0
+            text = " " * max(indent - base_indent, 0) + line.lstrip(" ")
+            self.line_text[key] = text
+        return text
+
+    def code_row(self, code, lineno, depth):
+        # The first traced frame is at depth 1; show it at column 0
+        depth = max(depth - 1, 0)
+        text = " " * (depth * self.tab_size) + self.source_text(code, lineno)
+        indent = len(text) - len(text.lstrip(" "))
+        # Tabs are the row's indentation level, as the editor derives them
+        # from every row's leading spaces: call depth plus the line's nesting
+        # inside its function, not the call depth alone
+        return self.writer_class.encode_row(CODE, indent // self.tab_size, text)
+
+    def record_line(self, code, lineno):
+        if self.writer is None:
+            return
+        batch = self.batch
+        filename = code.co_filename
+        if filename != self.last_file:
+            self.last_file = filename
+            batch.append(self.writer_class.encode_row(FILE_ANNOTATION, 0, filename))
+        rows = self.code_rows[id(code)]
+        key = (lineno, self.depth)
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = self.code_row(code, lineno, self.depth)
+        batch.append(row)
+        self.line_count += 1
+        if len(batch) >= self.BATCH_SIZE:
+            self.writer.write(batch)
+            self.batch = []
+        if self.max_lines is not None and self.line_count >= self.max_lines:
+            self.stop()
+
+    # sys.monitoring callbacks (3.12+)
+
+    def on_start(self, code, offset):
+        if get_ident() != self.thread_id:
+            return
+        if not self.is_traced(code):
+            return sys.monitoring.DISABLE
+        self.depth += 1
+
+    def on_return(self, code, offset, value):
+        if get_ident() != self.thread_id:
+            return
+        if not self.is_traced(code):
+            return sys.monitoring.DISABLE
+        if self.depth > 0:
+            self.depth -= 1
+
+    def on_unwind(self, code, offset, exception):
+        # PY_UNWIND cannot be disabled per location
+        if get_ident() == self.thread_id and self.depth > 0 and self.is_traced(code):
+            self.depth -= 1
+
+    def on_line(self, code, lineno):
+        # Only switched on in code objects is_traced() accepted
+        if get_ident() == self.thread_id:
+            self.record_line(code, lineno)
+
+    # sys.settrace fallback
+
+    def global_trace(self, frame, event, arg):
+        if event != "call" or not self.is_traced(frame.f_code):
+            return None
+        self.depth += 1
+        return self.local_trace
+
+    def local_trace(self, frame, event, arg):
+        if event == "line":
+            self.record_line(frame.f_code, frame.f_lineno)
+        elif event == "return":
+            if self.depth > 0:
+                self.depth -= 1
+        return self.local_trace
+
+    def start(self):
+        self.writer = self.writer_class(self.filename, self.tab_size)
+        self.thread_id = get_ident()
+        self.last_file = None
+        if self.use_monitoring:
+            mon = sys.monitoring
+            events = mon.events
+            for tool_id in (mon.PROFILER_ID, mon.OPTIMIZER_ID, 3, 4):
+                if mon.get_tool(tool_id) is None:
+                    self.tool_id = tool_id
+                    break
+            else:
+                raise RuntimeError("no free sys.monitoring tool id")
+            mon.use_tool_id(self.tool_id, self.TOOL_NAME)
+            mon.register_callback(self.tool_id, events.PY_START, self.on_start)
+            mon.register_callback(self.tool_id, events.PY_RESUME, self.on_start)
+            mon.register_callback(self.tool_id, events.PY_RETURN, self.on_return)
+            mon.register_callback(self.tool_id, events.PY_YIELD, self.on_return)
+            mon.register_callback(self.tool_id, events.PY_UNWIND, self.on_unwind)
+            mon.register_callback(self.tool_id, events.LINE, self.on_line)
+            # LINE is switched on per code object by is_traced()
+            mon.set_events(self.tool_id, events.PY_START | events.PY_RESUME | events.PY_RETURN |
+                           events.PY_YIELD | events.PY_UNWIND)
+        else:
+            sys.settrace(self.global_trace)
+        return self
+
+    def stop(self):
+        if self.writer is None:
+            return
+        if self.use_monitoring:
+            mon = sys.monitoring
+            mon.set_events(self.tool_id, 0)
+            for code, traced in self.traced_code.values():
+                if traced:
+                    mon.set_local_events(self.tool_id, code, 0)
+            mon.free_tool_id(self.tool_id)
+            mon.restart_events()
+        else:
+            sys.settrace(None)
+        # A restart has to switch LINE events on again
+        self.traced_code = {}
+        self.code_rows = {}
+        if self.batch:
+            self.writer.write(self.batch)
+            self.batch = []
+        self.writer.close()
+        self.writer = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+def measure_overhead(fn, filename, repeat=3, **tracer_options):
+    """
+    Best-of-`repeat` wall time of fn() untraced and traced. Returns
+    (untraced_s, traced_s, traced / untraced). One untimed run comes first,
+    so imports and warm caches are not charged to the untraced baseline.
+    """
+    def best(run):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def traced():
+        with ExecutionTracer(filename, **tracer_options):
+            fn()
+
+    fn()
+    untraced_s = best(fn)
+    traced_s = best(traced)
+    return untraced_s, traced_s, traced_s / untraced_s if untraced_s else float("inf")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a Python script and record its execution as a .trace file.")
+    parser.add_argument("-o", "--output", default="execution.trace")
+    parser.add_argument("--tab-size", type=int, default=4)
+    parser.add_argument("--include", action="append", help="only trace files under this path (repeatable)")
+    parser.add_argument("--exclude", action="append", help="never trace files under this path (repeatable)")
+    parser.add_argument("--max-lines", type=int, help="stop recording after this many executed lines")
+    parser.add_argument("--stream", action="store_true",
+                        help="write JSON-lines rows that the editor can follow live (File > Follow File)")
+    parser.add_argument("--settrace", action="store_true", help="use sys.settrace even where sys.monitoring exists")
+    parser.add_argument("--overhead", action="store_true",
+                        help="also run the script untraced and report the tracing overhead")
+    parser.add_argument("script")
+    parser.add_argument("args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    sys.argv = [args.script] + args.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    options = {
+        "tab_size": args.tab_size,
+        "include": args.include,
+        "exclude": args.exclude,
+        "max_lines": args.max_lines,
+        "use_monitoring": False if args.settrace else None,
+        "stream": args.stream
+    }
+    run = lambda: runpy.run_path(args.script, run_name="__main__")
+
+    if args.overhead:
+        untraced_s, traced_s, ratio = measure_overhead(run, args.output, **options)
+        print(f"untraced {untraced_s:.3f} s, traced {traced_s:.3f} s, overhead x{ratio:.2f}", file=sys.stderr)
+    else:
+        with ExecutionTracer(args.output, **options):
+            run()
+
+if __name__ == "__main__":
+    main()